@@ -8,6 +8,16 @@ load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
 class Settings:
     """应用配置类"""
     
+    # 服务启动配置
+    HOST: str = os.getenv("HOST", "0.0.0.0")
+    PORT: int = int(os.getenv("PORT", "8000"))
+    RELOAD: bool = os.getenv("RELOAD", "false").lower() == "true"  # 开发模式热重载(单进程)
+    # worker 进程数; 千问 API 的限流配额按 worker 数平均分摊,worker 越多每个进程分到的越少
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "2"))
+    BACKLOG: int = int(os.getenv("BACKLOG", "2048"))
+    KEEP_ALIVE: int = int(os.getenv("KEEP_ALIVE", "5"))  # keep-alive 超时(秒)
+    GRACEFUL_TIMEOUT: int = int(os.getenv("GRACEFUL_TIMEOUT", "30"))  # 优雅关闭等待时间(秒)
+    
     # 阿里云百炼平台 API 配置
     QWEN_API_KEY: str = os.getenv("QWEN_API_KEY", "")
     QWEN_API_URL: str = os.getenv("QWEN_API_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1")
@@ -15,9 +25,41 @@ class Settings:
     # 数据库配置
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./data/health.db")
     
+    # 数据库连接池配置
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    
+    # SQLite PRAGMA 配置(WAL 模式下读写互不阻塞)
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT: int = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # 毫秒
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", "268435456"))  # 256MB
+    SQLITE_CACHE_SIZE: int = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # 负数单位为 KB, 即 64MB
+    
     # 文件上传配置
     UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "./uploads")
     MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", "10485760"))  # 10MB
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", "65536"))  # 分块读取大小
+    UPLOAD_SPOOL_THRESHOLD: int = int(os.getenv("UPLOAD_SPOOL_THRESHOLD", "1048576"))  # 超过 1MB 写入 UPLOAD_DIR 临时文件
+    
+    # 密码哈希配置
+    PASSWORD_HASH_ALGORITHM: str = os.getenv("PASSWORD_HASH_ALGORITHM", "scrypt")  # scrypt/pbkdf2_sha256
+    PASSWORD_SCRYPT_N: int = int(os.getenv("PASSWORD_SCRYPT_N", "16384"))
+    PASSWORD_SCRYPT_R: int = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+    PASSWORD_SCRYPT_P: int = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+    PASSWORD_PBKDF2_ITERATIONS: int = int(os.getenv("PASSWORD_PBKDF2_ITERATIONS", "600000"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))  # 哈希线程池大小
+    
+    # 登录令牌配置
+    TOKEN_MODE: str = os.getenv("TOKEN_MODE", "opaque")  # opaque: 存储查找 / signed: HMAC 签名无状态令牌
+    TOKEN_SECRET: str = os.getenv("TOKEN_SECRET", "")  # signed 模式的签名密钥,多 worker 必须一致
+    TOKEN_REVOCATION_SYNC_INTERVAL: int = int(os.getenv("TOKEN_REVOCATION_SYNC_INTERVAL", "30"))  # 吊销列表同步间隔(秒)
+    TOKEN_STORE: str = os.getenv("TOKEN_STORE", "database")  # memory/database/redis
+    TOKEN_TTL_DAYS: int = int(os.getenv("TOKEN_TTL_DAYS", "30"))
+    TOKEN_STORE_MAX_SIZE: int = int(os.getenv("TOKEN_STORE_MAX_SIZE", "10000"))  # 内存存储上限
+    TOKEN_SWEEP_INTERVAL: int = int(os.getenv("TOKEN_SWEEP_INTERVAL", "300"))  # 过期清理间隔(秒)
+    REDIS_URL: str = os.getenv("REDIS_URL", "")  # 为空时使用进程内替代实现
     
     # CORS 配置
     CORS_ORIGINS: List[str] = [
@@ -27,17 +69,85 @@ class Settings:
     ]
     
     # API 超时配置
-    API_TIMEOUT: int = 30
+    API_TIMEOUT: int = int(os.getenv("API_TIMEOUT", "30"))
+    
+    # 千问 HTTP 连接池配置
+    QWEN_HTTP2: bool = os.getenv("QWEN_HTTP2", "true").lower() == "true"
+    QWEN_MAX_CONNECTIONS: int = int(os.getenv("QWEN_MAX_CONNECTIONS", "20"))
+    QWEN_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("QWEN_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    QWEN_KEEPALIVE_EXPIRY: float = float(os.getenv("QWEN_KEEPALIVE_EXPIRY", "60"))
+    QWEN_CONNECT_TIMEOUT: float = float(os.getenv("QWEN_CONNECT_TIMEOUT", "5"))
+    
+    # 千问 API 限流(整个部署的配额,启动时按 WEB_CONCURRENCY 平均分给每个 worker; 0 表示不限制)
+    # 并发数分摊后每个 worker 不低于 QWEN_PER_USER_CONCURRENCY
+    VISION_RPM: int = int(os.getenv("VISION_RPM", "60"))  # 每分钟请求数
+    VISION_TPM: int = int(os.getenv("VISION_TPM", "100000"))  # 每分钟 token 数
+    VISION_MAX_CONCURRENCY: int = int(os.getenv("VISION_MAX_CONCURRENCY", "4"))
+    DIET_RPM: int = int(os.getenv("DIET_RPM", "60"))
+    DIET_TPM: int = int(os.getenv("DIET_TPM", "100000"))
+    DIET_MAX_CONCURRENCY: int = int(os.getenv("DIET_MAX_CONCURRENCY", "8"))
+    QWEN_PER_USER_CONCURRENCY: int = int(os.getenv("QWEN_PER_USER_CONCURRENCY", "4"))  # 单个用户同时进行的调用数(每个进程)
+    QWEN_RATE_LIMIT_RETRIES: int = int(os.getenv("QWEN_RATE_LIMIT_RETRIES", "3"))  # 429 后的重试次数
+    QWEN_RATE_LIMIT_BACKOFF: float = float(os.getenv("QWEN_RATE_LIMIT_BACKOFF", "1"))  # 无 Retry-After 时的退避基数(秒)
+    
+    # 千问 API 容错(网络错误/5xx 重试、对冲请求、熔断)
+    QWEN_MAX_RETRIES: int = int(os.getenv("QWEN_MAX_RETRIES", "2"))
+    QWEN_RETRY_BASE_DELAY: float = float(os.getenv("QWEN_RETRY_BASE_DELAY", "0.5"))  # 退避基数(秒)
+    QWEN_RETRY_MAX_DELAY: float = float(os.getenv("QWEN_RETRY_MAX_DELAY", "5"))
+    QWEN_HEDGE: bool = os.getenv("QWEN_HEDGE", "false").lower() == "true"  # 超过 p95 耗时后发出第二个请求
+    QWEN_HEDGE_MIN_DELAY: float = float(os.getenv("QWEN_HEDGE_MIN_DELAY", "2"))  # 对冲等待时间下限(秒)
+    QWEN_HEDGE_MIN_SAMPLES: int = int(os.getenv("QWEN_HEDGE_MIN_SAMPLES", "20"))  # 耗时样本足够后才对冲
+    QWEN_BREAKER_FAILURES: int = int(os.getenv("QWEN_BREAKER_FAILURES", "5"))  # 连续失败次数达到后熔断
+    QWEN_BREAKER_RESET: float = float(os.getenv("QWEN_BREAKER_RESET", "30"))  # 熔断后多久允许探测(秒)
+    
+    # AI 结果缓存配置
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "database")  # memory/database
+    VISION_CACHE_TTL: int = int(os.getenv("VISION_CACHE_TTL", "604800"))  # 7天
+    VISION_CACHE_MAX_ENTRIES: int = int(os.getenv("VISION_CACHE_MAX_ENTRIES", "2000"))
+    DIET_CACHE_TTL: int = int(os.getenv("DIET_CACHE_TTL", "2592000"))  # 30天
+    DIET_CACHE_MAX_ENTRIES: int = int(os.getenv("DIET_CACHE_MAX_ENTRIES", "5000"))
     
     # Vision API 参数
     VISION_MODEL: str = "qwen-vl-max-latest"  # 千问 VL 多模态模型
     VISION_TEMPERATURE: float = 0.1
     VISION_MAX_TOKENS: int = 1000
+    VISION_TIMEOUT: float = float(os.getenv("VISION_TIMEOUT", str(API_TIMEOUT)))
+    
+    # 批量识别参数
+    VISION_BATCH_MAX_FILES: int = int(os.getenv("VISION_BATCH_MAX_FILES", "14"))
+    VISION_BATCH_CONCURRENCY: int = int(os.getenv("VISION_BATCH_CONCURRENCY", "4"))  # 不超过 QWEN_PER_USER_CONCURRENCY
+    
+    # 截图预处理参数(上传模型前缩放和重新编码)
+    VISION_IMAGE_MAX_DIM: int = int(os.getenv("VISION_IMAGE_MAX_DIM", "1600"))  # 长边像素
+    VISION_IMAGE_FORMAT: str = os.getenv("VISION_IMAGE_FORMAT", "JPEG")  # JPEG/WEBP
+    VISION_IMAGE_QUALITY: int = int(os.getenv("VISION_IMAGE_QUALITY", "85"))
+    VISION_IMAGE_CROP: bool = os.getenv("VISION_IMAGE_CROP", "false").lower() == "true"  # 裁掉纯色边框
+    VISION_IMAGE_WORKERS: int = int(os.getenv("VISION_IMAGE_WORKERS", "2"))
+    
+    # 本地 OCR 快速通道(常见华为/苹果截图版式,置信度足够时不调用模型)
+    VISION_LOCAL_RECOGNIZERS: str = os.getenv("VISION_LOCAL_RECOGNIZERS", "")  # 逗号分隔,默认关闭
+    VISION_OCR_LANG: str = os.getenv("VISION_OCR_LANG", "chi_sim+eng")
+    VISION_OCR_MIN_CONFIDENCE: float = float(os.getenv("VISION_OCR_MIN_CONFIDENCE", "0.8"))
+    
+    # 运动类型分类(加分、MET 值、别名归并)
+    EXERCISE_TAXONOMY_FILE: str = os.getenv("EXERCISE_TAXONOMY_FILE", "")  # JSON 文件,留空使用内置分类表
+    EXERCISE_NORMALIZE_TYPES: bool = os.getenv("EXERCISE_NORMALIZE_TYPES", "false").lower() == "true"  # 保存时归并为规范名称
     
     # 饮食分析 API 参数
     DIET_MODEL: str = "qwen-plus-latest"  # 千问文本模型
     DIET_TEMPERATURE: float = 0.3
     DIET_MAX_TOKENS: int = 1500
+    DIET_TIMEOUT: float = float(os.getenv("DIET_TIMEOUT", str(API_TIMEOUT)))
+    DIET_STREAM: bool = os.getenv("DIET_STREAM", "false").lower() == "true"  # 流式调用,必填字段收齐后提前断开
+    DIET_BATCH_MAX_MEALS: int = int(os.getenv("DIET_BATCH_MAX_MEALS", "8"))  # 批量记录单次最多餐数
+    DIET_LOCAL_FAST_PATH: bool = os.getenv("DIET_LOCAL_FAST_PATH", "false").lower() == "true"  # 常见食物本地估算,不调用模型(先用 scripts.compare_diet_scores 校验)
+    
+    # 后台任务队列(异步识别/分析)
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "4"))  # 每个进程的并发任务数
+    JOB_POLL_INTERVAL: float = float(os.getenv("JOB_POLL_INTERVAL", "1"))  # 空闲时轮询间隔(秒)
+    JOB_LEASE_SECONDS: int = int(os.getenv("JOB_LEASE_SECONDS", "180"))  # 执行超时后重新入队
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETENTION_HOURS: int = int(os.getenv("JOB_RETENTION_HOURS", "24"))  # 已完成任务保留时间
 
 settings = Settings()
 
@@ -1,12 +1,85 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from config import settings
 
+# 同步驱动 -> 异步驱动
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def get_async_database_url(database_url: str) -> str:
+    """将数据库 URL 转换为对应的异步驱动 URL"""
+    scheme, sep, rest = database_url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+def is_sqlite(database_url: str) -> bool:
+    return database_url.startswith("sqlite")
+
+
+def _pool_options(database_url: str, poolclass) -> dict:
+    """连接池参数(SQLite 内存库只能使用单连接池)"""
+    if is_sqlite(database_url) and (":memory:" in database_url or database_url.rstrip("/").endswith(":")):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """每个新连接上设置 SQLite PRAGMA"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT}")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE}")
+    cursor.close()
+
+
+def build_engine(database_url: str) -> Engine:
+    """创建同步引擎"""
+    if not is_sqlite(database_url):
+        return create_engine(database_url, echo=False, **_pool_options(database_url, QueuePool))
+    
+    sqlite_engine = create_engine(
+        database_url,
+        echo=False,  # 设置为 True 可以看到 SQL 语句
+        connect_args={"check_same_thread": False},  # SQLite 需要
+        **_pool_options(database_url, QueuePool)
+    )
+    event.listen(sqlite_engine, "connect", set_sqlite_pragmas)
+    return sqlite_engine
+
+
+def build_async_engine(database_url: str):
+    """创建异步引擎"""
+    async_url = get_async_database_url(database_url)
+    options = _pool_options(database_url, AsyncAdaptedQueuePool)
+    
+    if not is_sqlite(database_url):
+        return create_async_engine(async_url, echo=False, **options)
+    
+    sqlite_engine = create_async_engine(async_url, echo=False, **options)
+    event.listen(sqlite_engine.sync_engine, "connect", set_sqlite_pragmas)
+    return sqlite_engine
+
+
 # 创建数据库引擎
-engine = create_engine(
-    settings.DATABASE_URL,
-    echo=False,  # 设置为 True 可以看到 SQL 语句
-    connect_args={"check_same_thread": False}  # SQLite 需要
-)
+engine = build_engine(settings.DATABASE_URL)
+
+# 异步引擎(供 async 路由使用,数据库 IO 不阻塞事件循环)
+async_engine = build_async_engine(settings.DATABASE_URL)
 
 def create_db_and_tables():
     """创建数据库表"""
@@ -16,3 +89,9 @@ def get_session():
     """获取数据库会话"""
     with Session(engine) as session:
         yield session
+
+async def get_async_session():
+    """获取异步数据库会话"""
+    # 提交后不过期对象,避免在返回响应时触发隐式的同步加载
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
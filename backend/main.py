@@ -1,22 +1,53 @@
 """FastAPI 应用主程序"""
+import asyncio
 import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager
+from sqlalchemy.exc import IntegrityError
 from config import settings
 from database import create_db_and_tables
-from routers import exercise, meals, tasks, auth
-from models import User
+from routers import exercise, meals, tasks, auth, jobs, leaderboard
+from models import User, DailySummary, LeaderboardEntry
+from services import qwen
+from services.cache import cache_stats
+from services.ratelimit import rate_limit_stats
+from services.resilience import resilience_stats
+from services.vision import local_recognition_stats, preprocess_stats
+from services.diet import nutrition_stats
+from services.trends import rebuild_daily_summaries
+from services.leaderboard import rebuild_leaderboard
+from services.token_store import sweep_expired_tokens
+from services.signed_token import sync_revocations
+from services.passwords import hash_password
+from services.uploads import MULTIPART_OVERHEAD, UploadSizeLimitMiddleware
+from services.jobs import start_workers, stop_workers
 from sqlmodel import Session, select
-from database import engine
+from database import engine, async_engine
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """应用生命周期管理"""
-    # 启动时创建数据库表
+@contextmanager
+def startup_lock():
+    """多个 worker 同时启动时,串行执行数据库初始化"""
+    try:
+        import fcntl
+    except ImportError:
+        # Windows 没有 fcntl,单进程运行时无需加锁
+        yield
+        return
+    
+    with open(os.path.join("./data", ".startup.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def initialize_database():
+    """建表、创建默认用户、回填每日汇总(可重复执行)"""
     create_db_and_tables()
     
     # 创建默认测试用户(如果不存在)
@@ -25,20 +56,66 @@ async def lifespan(app: FastAPI):
         existing_user = session.exec(statement).first()
         
         if not existing_user:
-            import hashlib
             default_user = User(
                 id=1, 
                 username="test",
-                password_hash=hashlib.sha256("123456".encode()).hexdigest(),
+                password_hash=hash_password("123456"),
                 name="测试用户",
                 total_score=0
             )
             session.add(default_user)
+            try:
+                session.commit()
+                print("✅ 已创建默认测试用户 (username=test, password=123456)")
+            except IntegrityError:
+                # 其他节点已经创建
+                session.rollback()
+    
+    # 首次启用每日汇总表时回填历史数据
+    with Session(engine) as session:
+        if session.exec(select(DailySummary)).first() is None:
+            count = rebuild_daily_summaries(session)
+            if count:
+                print(f"✅ 已回填每日汇总 {count} 条")
+    
+    # 首次启用排行榜时根据每日汇总回填积分
+    with Session(engine) as session:
+        if session.exec(select(LeaderboardEntry)).first() is None:
+            user_ids = session.exec(select(DailySummary.user_id).distinct()).all()
+            for user_id in user_ids:
+                rebuild_leaderboard(session, user_id)
             session.commit()
-            print("✅ 已创建默认测试用户 (username=test, password=123456)")
+            if user_ids:
+                print(f"✅ 已回填排行榜积分 {len(user_ids)} 个用户")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期管理"""
+    # 启动时初始化数据库(多 worker 之间加锁)
+    with startup_lock():
+        initialize_database()
     
     print("✅ 数据库初始化完成")
+    
+    # 创建共享的千问 HTTP 客户端(连接池复用)
+    await qwen.init_client()
+    
+    # 后台任务: 清理过期 token / 同步签名令牌吊销列表
+    if settings.TOKEN_MODE == "signed":
+        token_task = asyncio.create_task(sync_revocations(settings.TOKEN_REVOCATION_SYNC_INTERVAL))
+    else:
+        token_task = asyncio.create_task(
+            sweep_expired_tokens(auth.token_store, settings.TOKEN_SWEEP_INTERVAL)
+        )
+    
+    # 后台任务 worker(异步识别/分析)
+    job_tasks = start_workers()
     yield
+    await stop_workers(job_tasks)
+    token_task.cancel()
+    await qwen.close_client()
+    await async_engine.dispose()
     print("👋 应用关闭")
 
 
@@ -50,6 +127,17 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 上传接口在解析请求体之前检查大小
+# 先于 CORS 注册: 后注册的中间件在外层,CORS 包住 413 响应才能带上跨域头
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={
+        "/api/parse_report": settings.MAX_FILE_SIZE + MULTIPART_OVERHEAD,
+        "/api/jobs/parse_report": settings.MAX_FILE_SIZE + MULTIPART_OVERHEAD,
+        "/api/parse_report/batch": settings.MAX_FILE_SIZE * settings.VISION_BATCH_MAX_FILES + MULTIPART_OVERHEAD,
+    }
+)
+
 # 配置 CORS - 允许所有来源（生产环境应限制）
 app.add_middleware(
     CORSMiddleware,
@@ -64,6 +152,8 @@ app.include_router(auth.router)
 app.include_router(exercise.router)
 app.include_router(meals.router)
 app.include_router(tasks.router)
+app.include_router(jobs.router)
+app.include_router(leaderboard.router)
 
 # 挂载前端静态文件（Railway 一体化部署）
 frontend_dist = os.path.join(os.path.dirname(__file__), "..", "frontend", "dist")
@@ -94,11 +184,37 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def metrics():
+    """运行指标"""
+    return {
+        "caches": cache_stats(),
+        "vision_images": preprocess_stats(),
+        "vision_local": local_recognition_stats(),
+        "diet_local": nutrition_stats,
+        "rate_limits": rate_limit_stats(),
+        "resilience": resilience_stats()
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
+    
+    # 开发模式: 单进程 + 文件监听; 生产模式: 多 worker
+    workers = 1 if settings.RELOAD else settings.WEB_CONCURRENCY
+    if workers > 1 and settings.TOKEN_MODE != "signed" and settings.TOKEN_STORE == "memory":
+        print("⚠️ 多 worker 下 TOKEN_STORE=memory 的登录状态不共享,请使用 database/redis 或 TOKEN_MODE=signed")
+    
     uvicorn.run(
         "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=settings.HOST,
+        port=settings.PORT,
+        reload=settings.RELOAD,
+        workers=workers,
+        backlog=settings.BACKLOG,
+        timeout_keep_alive=settings.KEEP_ALIVE,
+        timeout_graceful_shutdown=settings.GRACEFUL_TIMEOUT,
+        proxy_headers=True,
+        forwarded_allow_ips="*"
     )
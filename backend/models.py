@@ -1,7 +1,7 @@
 from datetime import datetime, date
 from typing import Optional
 from sqlmodel import Field, SQLModel, JSON, Column
-from sqlalchemy import Index
+from sqlalchemy import Index, PrimaryKeyConstraint
 
 
 class User(SQLModel, table=True):
@@ -73,3 +73,123 @@ class DailyTask(SQLModel, table=True):
     date: date
     reward_points: int = Field(default=10, ge=0)
     created_at: datetime = Field(default_factory=datetime.now)
+
+
+class CacheEntry(SQLModel, table=True):
+    """结果缓存表(AI 识别/分析结果)"""
+    __tablename__ = "cache_entries"
+    __table_args__ = (
+        Index('idx_cache_ns_accessed', 'namespace', 'accessed_at'),
+    )
+    
+    namespace: str = Field(max_length=30, primary_key=True)  # vision/diet
+    key: str = Field(max_length=64, primary_key=True)  # 内容哈希
+    value: str  # JSON 格式存储结果
+    expires_at: datetime
+    accessed_at: datetime = Field(default_factory=datetime.now)
+
+
+class DailySummary(SQLModel, table=True):
+    """每日汇总表(写入时增量维护,趋势查询直接读取)"""
+    __tablename__ = "daily_summaries"
+    __table_args__ = (
+        PrimaryKeyConstraint('user_id', 'date'),
+    )
+    
+    user_id: int = Field(foreign_key="users.id")
+    date: date
+    exercise_calories: int = Field(default=0, ge=0)
+    exercise_duration: int = Field(default=0, ge=0)
+    exercise_steps: int = Field(default=0, ge=0)
+    exercise_score_sum: int = Field(default=0, ge=0)  # 当日运动得分之和(未封顶)
+    meal_calories: int = Field(default=0, ge=0)
+    meal_score_sum: int = Field(default=0, ge=0)
+    meal_count: int = Field(default=0, ge=0)
+    task_total: int = Field(default=0, ge=0)
+    task_done: int = Field(default=0, ge=0)
+    task_points: int = Field(default=0, ge=0)
+    daily_score: int = Field(default=0, ge=0, le=100)  # 综合得分
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+
+class AuthToken(SQLModel, table=True):
+    """登录令牌表(多进程共享)"""
+    __tablename__ = "auth_tokens"
+    __table_args__ = (
+        Index('idx_token_expires', 'expires_at'),
+    )
+    
+    token_hash: str = Field(max_length=64, primary_key=True)  # 令牌的 SHA-256,不保存明文
+    user_id: int = Field(foreign_key="users.id")
+    expires_at: datetime
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
+class RevokedToken(SQLModel, table=True):
+    """已吊销的签名令牌(登出)"""
+    __tablename__ = "revoked_tokens"
+    __table_args__ = (
+        Index('idx_revoked_expires', 'expires_at'),
+    )
+    
+    jti: str = Field(max_length=32, primary_key=True)  # 令牌唯一标识
+    expires_at: datetime  # 令牌本身的过期时间,过期后可删除
+
+
+class Job(SQLModel, table=True):
+    """后台任务队列(截图识别/饮食分析)"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index('idx_job_status_created', 'status', 'created_at'),
+    )
+    
+    id: str = Field(max_length=32, primary_key=True)  # uuid4 十六进制
+    kind: str = Field(max_length=20)  # vision/diet
+    user_id: int = Field(foreign_key="users.id")
+    status: str = Field(default="queued", max_length=20)  # queued/running/succeeded/failed
+    payload: str  # JSON 格式存储任务参数
+    result: Optional[str] = Field(default=None)  # JSON 格式存储结果
+    error: Optional[str] = Field(default=None)
+    attempts: int = Field(default=0, ge=0)
+    lease_expires_at: Optional[datetime] = Field(default=None)  # 执行超时后可被其他 worker 重新领取
+    created_at: datetime = Field(default_factory=datetime.now)
+    finished_at: Optional[datetime] = Field(default=None)
+
+
+class Family(SQLModel, table=True):
+    """家庭(排行榜分组)"""
+    __tablename__ = "families"
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str = Field(max_length=50)
+    invite_code: str = Field(max_length=32, unique=True, index=True)  # 加入家庭需要的邀请码
+    created_by: int = Field(foreign_key="users.id")
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
+class FamilyMember(SQLModel, table=True):
+    """家庭成员"""
+    __tablename__ = "family_members"
+    __table_args__ = (
+        PrimaryKeyConstraint('family_id', 'user_id'),
+        Index('idx_family_member_user', 'user_id'),
+    )
+    
+    family_id: int = Field(foreign_key="families.id")
+    user_id: int = Field(foreign_key="users.id")
+    joined_at: datetime = Field(default_factory=datetime.now)
+
+
+class LeaderboardEntry(SQLModel, table=True):
+    """排行榜积分(每日汇总变化时增量维护)"""
+    __tablename__ = "leaderboard_entries"
+    __table_args__ = (
+        PrimaryKeyConstraint('period', 'period_key', 'user_id'),
+        Index('idx_leaderboard_rank', 'period', 'period_key', 'points'),
+    )
+    
+    period: str = Field(max_length=10)  # daily/weekly/all
+    period_key: str = Field(max_length=10)  # 2025-11-10 / 2025-W46 / all
+    user_id: int = Field(foreign_key="users.id")
+    points: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.now)
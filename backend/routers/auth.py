@@ -2,19 +2,29 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic import BaseModel
 from datetime import datetime, timedelta
-import hashlib
+import asyncio
 import secrets
 
-from database import get_session
+from config import settings
+from database import get_session, get_async_session
 from models import User
+from services.passwords import (
+    DUMMY_PASSWORD_HASH,
+    hash_password_async,
+    needs_rehash,
+    verify_password_async,
+)
+from services.token_store import create_token_store
+from services.signed_token import issue_signed_token, verify_signed_token, revoke_signed_token
 
 router = APIRouter(prefix="/api/auth", tags=["认证"])
 security = HTTPBearer()
 
-# 简单的 token 存储（生产环境应使用 Redis）
-active_tokens = {}
+# token 存储(memory/database/redis,由 TOKEN_STORE 配置)
+token_store = create_token_store()
 
 
 class RegisterRequest(BaseModel):
@@ -39,18 +49,16 @@ class UserResponse(BaseModel):
     token: str
 
 
-def hash_password(password: str) -> str:
-    """密码哈希"""
-    return hashlib.sha256(password.encode()).hexdigest()
-
-
 def create_token(user_id: int) -> str:
     """创建 token"""
+    expires_at = datetime.now() + timedelta(days=settings.TOKEN_TTL_DAYS)
+    
+    # 签名模式: 令牌自带用户和过期时间,不写入存储
+    if settings.TOKEN_MODE == "signed":
+        return issue_signed_token(user_id, expires_at)
+    
     token = secrets.token_urlsafe(32)
-    active_tokens[token] = {
-        "user_id": user_id,
-        "expires_at": datetime.now() + timedelta(days=30)
-    }
+    token_store.set(token, user_id, expires_at)
     return token
 
 
@@ -58,29 +66,29 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security))
     """验证 token 并返回用户 ID"""
     token = credentials.credentials
     
-    if token not in active_tokens:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="无效的认证令牌"
-        )
+    # 签名模式: 纯 CPU 校验签名和过期时间
+    if settings.TOKEN_MODE == "signed":
+        user_id = verify_signed_token(token)
+    else:
+        # 过期的 token 由存储层删除并视为不存在
+        token_data = token_store.get(token)
+        user_id = token_data["user_id"] if token_data else None
     
-    token_data = active_tokens[token]
-    if datetime.now() > token_data["expires_at"]:
-        del active_tokens[token]
+    if user_id is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="认证令牌已过期"
+            detail="无效或已过期的认证令牌"
         )
     
-    return token_data["user_id"]
+    return user_id
 
 
 @router.post("/register", response_model=UserResponse)
-def register(request: RegisterRequest, session: Session = Depends(get_session)):
+async def register(request: RegisterRequest, session: AsyncSession = Depends(get_async_session)):
     """用户注册"""
     # 检查用户名是否已存在
     statement = select(User).where(User.username == request.username)
-    existing_user = session.exec(statement).first()
+    existing_user = (await session.exec(statement)).first()
     
     if existing_user:
         raise HTTPException(
@@ -91,17 +99,17 @@ def register(request: RegisterRequest, session: Session = Depends(get_session)):
     # 创建新用户
     user = User(
         username=request.username,
-        password_hash=hash_password(request.password),
+        password_hash=await hash_password_async(request.password),
         name=request.name,
         total_score=0
     )
     
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
     
     # 创建 token
-    token = create_token(user.id)
+    token = await asyncio.to_thread(create_token, user.id)
     
     return UserResponse(
         id=user.id,
@@ -113,27 +121,30 @@ def register(request: RegisterRequest, session: Session = Depends(get_session)):
 
 
 @router.post("/login", response_model=UserResponse)
-def login(request: LoginRequest, session: Session = Depends(get_session)):
+async def login(request: LoginRequest, session: AsyncSession = Depends(get_async_session)):
     """用户登录"""
     # 查找用户
     statement = select(User).where(User.username == request.username)
-    user = session.exec(statement).first()
+    user = (await session.exec(statement)).first()
     
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="用户名或密码错误"
-        )
+    # 验证密码(用户不存在时同样执行一次校验,响应时间一致)
+    password_hash = user.password_hash if user else DUMMY_PASSWORD_HASH
+    password_ok = await verify_password_async(request.password, password_hash)
     
-    # 验证密码
-    if user.password_hash != hash_password(request.password):
+    if not user or not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误"
         )
     
+    # 旧格式哈希(无盐 SHA-256)或参数已调整时,用当前算法重新哈希
+    if needs_rehash(user.password_hash):
+        user.password_hash = await hash_password_async(request.password)
+        session.add(user)
+        await session.commit()
+    
     # 创建 token
-    token = create_token(user.id)
+    token = await asyncio.to_thread(create_token, user.id)
     
     return UserResponse(
         id=user.id,
@@ -147,6 +158,7 @@ def login(request: LoginRequest, session: Session = Depends(get_session)):
 @router.get("/me", response_model=UserResponse)
 def get_current_user(
     user_id: int = Depends(verify_token),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
     session: Session = Depends(get_session)
 ):
     """获取当前登录用户信息"""
@@ -158,9 +170,8 @@ def get_current_user(
             detail="用户不存在"
         )
     
-    # 返回当前 token（从请求头获取）
-    # 这里简化处理，实际应该从请求中提取
-    token = list(active_tokens.keys())[0] if active_tokens else ""
+    # 返回当前请求使用的 token
+    token = credentials.credentials
     
     return UserResponse(
         id=user.id,
@@ -174,7 +185,8 @@ def get_current_user(
 @router.post("/logout")
 def logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """用户登出"""
-    token = credentials.credentials
-    if token in active_tokens:
-        del active_tokens[token]
+    if settings.TOKEN_MODE == "signed":
+        revoke_signed_token(credentials.credentials)
+    else:
+        token_store.delete(credentials.credentials)
     return {"message": "登出成功"}
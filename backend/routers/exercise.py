@@ -1,20 +1,57 @@
 """运动相关路由"""
+import asyncio
 from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import date
-from database import get_session
+from typing import Dict, List
+from config import settings
+from database import get_async_session
 from models import ExerciseRecord
 from services.vision import parse_exercise_screenshot
+from services.uploads import UploadError, read_upload
+from services.resilience import CircuitOpenError
+from services.ratelimit import vision_limiter
 from services.score import calculate_score
+from services.trends import refresh_daily_summary
 
 router = APIRouter(prefix="/api", tags=["exercise"])
 
+def build_exercise_record(user_id: int, recognized_data: Dict, score: int) -> ExerciseRecord:
+    """根据识别结果构建运动记录"""
+    return ExerciseRecord(
+        user_id=user_id,
+        exercise_type=recognized_data["exercise_type"],
+        duration_min=recognized_data["duration_min"],
+        calories=recognized_data["calories"],
+        steps=recognized_data.get("steps"),
+        avg_heart_rate=recognized_data.get("avg_heart_rate"),
+        max_heart_rate=recognized_data.get("max_heart_rate"),
+        source_device=recognized_data["source_device"],
+        date=recognized_data["date"],
+        score=score
+    )
+
+
+def exercise_response_data(recognized_data: Dict, score: int) -> Dict:
+    """识别结果的返回格式"""
+    return {
+        "exercise_type": recognized_data["exercise_type"],
+        "duration_min": recognized_data["duration_min"],
+        "calories": recognized_data["calories"],
+        "steps": recognized_data.get("steps"),
+        "avg_heart_rate": recognized_data.get("avg_heart_rate"),
+        "max_heart_rate": recognized_data.get("max_heart_rate"),
+        "score": score,
+        "source_device": recognized_data["source_device"],
+        "date": str(recognized_data["date"])
+    }
+
 
 @router.post("/parse_report")
 async def parse_exercise_report(
     file: UploadFile = File(...),
     user_id: int = Form(...),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     上传运动截图并识别数据
@@ -27,60 +64,114 @@ async def parse_exercise_report(
     Returns:
         识别结果和得分
     """
-    # 验证文件类型
-    if file.content_type not in ["image/jpeg", "image/png", "image/jpg"]:
-        raise HTTPException(status_code=400, detail="文件格式不支持,仅支持 jpg/png")
+    # 分块读取文件,同时校验大小和文件头格式
+    try:
+        upload = await read_upload(file)
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # 读取文件内容
     try:
-        image_bytes = await file.read()
-        
-        # 验证文件大小 (10MB)
-        if len(image_bytes) > 10 * 1024 * 1024:
-            raise HTTPException(status_code=400, detail="文件大小超过限制(最大10MB)")
-        
         # 调用 Vision 识别服务
-        recognized_data = await parse_exercise_screenshot(image_bytes)
+        with upload:
+            recognized_data = await parse_exercise_screenshot(upload.file, upload.sha256, user_id=user_id)
         
         # 计算得分
         score = calculate_score(recognized_data)
         recognized_data["score"] = score
         
         # 保存到数据库
-        exercise_record = ExerciseRecord(
-            user_id=user_id,
-            exercise_type=recognized_data["exercise_type"],
-            duration_min=recognized_data["duration_min"],
-            calories=recognized_data["calories"],
-            steps=recognized_data.get("steps"),
-            avg_heart_rate=recognized_data.get("avg_heart_rate"),
-            max_heart_rate=recognized_data.get("max_heart_rate"),
-            source_device=recognized_data["source_device"],
-            date=recognized_data["date"],
-            score=score
-        )
+        exercise_record = build_exercise_record(user_id, recognized_data, score)
         
         session.add(exercise_record)
-        session.commit()
-        session.refresh(exercise_record)
+        await session.run_sync(refresh_daily_summary, user_id, exercise_record.date)
+        await session.commit()
+        await session.refresh(exercise_record)
         
         return {
             "success": True,
-            "data": {
-                "exercise_type": recognized_data["exercise_type"],
-                "duration_min": recognized_data["duration_min"],
-                "calories": recognized_data["calories"],
-                "steps": recognized_data.get("steps"),
-                "avg_heart_rate": recognized_data.get("avg_heart_rate"),
-                "max_heart_rate": recognized_data.get("max_heart_rate"),
-                "score": score,
-                "source_device": recognized_data["source_device"],
-                "date": str(recognized_data["date"])
-            },
+            "data": exercise_response_data(recognized_data, score),
             "message": "识别成功"
         }
         
     except ValueError as e:
         raise HTTPException(status_code=422, detail=f"识别失败: {str(e)}")
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"服务器错误: {str(e)}")
+
+
+@router.post("/parse_report/batch")
+async def parse_exercise_reports_batch(
+    files: List[UploadFile] = File(...),
+    user_id: int = Form(...),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    批量上传运动截图并并发识别
+    
+    Args:
+        files: 运动截图文件列表
+        user_id: 用户ID
+        session: 数据库会话
+    
+    Returns:
+        每个文件的识别结果(单个文件失败不影响其他文件)
+    """
+    if len(files) > settings.VISION_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"单次最多上传 {settings.VISION_BATCH_MAX_FILES} 张截图"
+        )
+    
+    # 限制同时进行的模型调用数(不超过限流器的全局和单用户并发,否则多出的调用只会在限流器里排队)
+    semaphore = asyncio.Semaphore(min(
+        settings.VISION_BATCH_CONCURRENCY,
+        vision_limiter.max_concurrency,
+        vision_limiter.per_user_concurrency
+    ))
+    
+    async def recognize(file: UploadFile) -> Dict:
+        result = {"filename": file.filename, "success": False}
+        
+        try:
+            upload = await read_upload(file)
+        except UploadError as e:
+            result["error"] = str(e)
+            return result
+        
+        try:
+            async with semaphore:
+                with upload:
+                    recognized_data = await parse_exercise_screenshot(upload.file, upload.sha256, user_id=user_id)
+        except ValueError as e:
+            result["error"] = f"识别失败: {str(e)}"
+            return result
+        except Exception as e:
+            result["error"] = f"服务器错误: {str(e)}"
+            return result
+        
+        score = calculate_score(recognized_data)
+        result.update(success=True, data=exercise_response_data(recognized_data, score))
+        result["record"] = build_exercise_record(user_id, recognized_data, score)
+        return result
+    
+    results = await asyncio.gather(*(recognize(file) for file in files))
+    
+    # 所有成功的记录在一个事务中写入
+    records = [result.pop("record") for result in results if result["success"]]
+    if records:
+        session.add_all(records)
+        for record_date in sorted({record.date for record in records}):
+            await session.run_sync(refresh_daily_summary, user_id, record_date)
+        await session.commit()
+    
+    return {
+        "success": bool(records),
+        "data": {
+            "results": results,
+            "succeeded": len(records),
+            "failed": len(results) - len(records)
+        },
+        "message": f"识别成功 {len(records)} 张,失败 {len(results) - len(records)} 张"
+    }
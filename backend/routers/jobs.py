@@ -0,0 +1,186 @@
+"""异步任务路由(提交后立即返回任务ID,通过轮询或 SSE 获取结果)"""
+import asyncio
+import json
+import os
+import shutil
+from datetime import date
+from typing import Dict
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+from config import settings
+from database import get_async_session
+from models import Job
+from routers.exercise import build_exercise_record, exercise_response_data
+from routers.meals import AddMealRequest, build_meal_record, meal_response_data, validate_meal_request
+from services.diet import analyze_meal_health
+from services.jobs import enqueue_job, get_job, job_event_stream, job_handler, job_view, new_job_id
+from services.score import calculate_score
+from services.trends import refresh_daily_summary
+from services.uploads import UploadError, read_upload
+from services.vision import parse_exercise_screenshot
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+# 待识别截图的保存目录(任务完成后删除)
+JOB_UPLOAD_DIR = os.path.join(settings.UPLOAD_DIR, "jobs")
+os.makedirs(JOB_UPLOAD_DIR, exist_ok=True)
+
+
+def remove_job_image(job: Job):
+    """删除任务对应的截图文件"""
+    path = json.loads(job.payload)["path"]
+    if os.path.exists(path):
+        os.remove(path)
+
+
+@job_handler("vision", cleanup=remove_job_image)
+async def run_vision_job(session: AsyncSession, job: Job) -> Dict:
+    """识别截图并保存运动记录"""
+    payload = json.loads(job.payload)
+    with open(payload["path"], "rb") as image:
+        recognized_data = await parse_exercise_screenshot(image, payload["sha256"], user_id=job.user_id)
+
+    score = calculate_score(recognized_data)
+    exercise_record = build_exercise_record(job.user_id, recognized_data, score)
+    session.add(exercise_record)
+    await session.run_sync(refresh_daily_summary, job.user_id, exercise_record.date)
+
+    return exercise_response_data(recognized_data, score)
+
+
+@job_handler("diet")
+async def run_diet_job(session: AsyncSession, job: Job) -> Dict:
+    """分析饮食并保存饮食记录"""
+    payload = json.loads(job.payload)
+    meal_date = date.fromisoformat(payload["date"])
+    analysis_result = await analyze_meal_health(payload["food_items"], user_id=job.user_id)
+
+    meal_record = build_meal_record(
+        job.user_id, payload["meal_type"], payload["food_items"], meal_date, analysis_result
+    )
+    session.add(meal_record)
+    await session.run_sync(refresh_daily_summary, job.user_id, meal_date)
+    await session.flush()
+
+    return meal_response_data(meal_record)
+
+
+@router.post("/parse_report", status_code=202)
+async def submit_parse_report(
+    file: UploadFile = File(...),
+    user_id: int = Form(...),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    提交运动截图识别任务
+
+    Args:
+        file: 运动截图文件
+        user_id: 用户ID
+        session: 数据库会话
+
+    Returns:
+        任务ID
+    """
+    try:
+        upload = await read_upload(file)
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # 截图保存到磁盘,由 worker 读取
+    job_id = new_job_id()
+    path = os.path.join(JOB_UPLOAD_DIR, job_id)
+    with upload:
+        await asyncio.to_thread(_save_upload, upload.file, path)
+
+    try:
+        job = await enqueue_job(session, "vision", user_id, {"path": path, "sha256": upload.sha256}, job_id=job_id)
+    except Exception:
+        os.remove(path)
+        raise
+
+    return {
+        "success": True,
+        "data": job_view(job),
+        "message": "任务已提交"
+    }
+
+
+def _save_upload(source, path: str):
+    with open(path, "wb") as target:
+        shutil.copyfileobj(source, target)
+
+
+@router.post("/meals", status_code=202)
+async def submit_meal_analysis(
+    request: AddMealRequest,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    提交饮食分析任务
+
+    Args:
+        request: 饮食记录请求
+        session: 数据库会话
+
+    Returns:
+        任务ID
+    """
+    validate_meal_request(request)
+
+    try:
+        date.fromisoformat(request.date)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"日期格式错误: {str(e)}")
+
+    job = await enqueue_job(session, "diet", request.user_id, {
+        "meal_type": request.meal_type,
+        "food_items": [item.dict() for item in request.food_items],
+        "date": request.date
+    })
+
+    return {
+        "success": True,
+        "data": job_view(job),
+        "message": "任务已提交"
+    }
+
+
+@router.get("/{job_id}")
+async def get_job_status(job_id: str):
+    """
+    查询任务状态和结果
+
+    Args:
+        job_id: 任务ID
+
+    Returns:
+        任务状态,完成后包含结果或错误信息
+    """
+    job = await get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+
+    return {
+        "success": True,
+        "data": job_view(job)
+    }
+
+
+@router.get("/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    以 Server-Sent Events 推送任务状态,任务结束后推送 result 事件并关闭
+
+    Args:
+        job_id: 任务ID
+    """
+    if await get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+
+    return StreamingResponse(
+        job_event_stream(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
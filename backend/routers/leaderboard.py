@@ -0,0 +1,192 @@
+"""家庭与排行榜路由"""
+import secrets
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from database import get_session
+from models import Family, FamilyMember, User
+from routers.auth import verify_token
+from services.leaderboard import PERIODS, family_member_ids, period_key, top_entries, user_rank
+
+router = APIRouter(prefix="/api", tags=["leaderboard"])
+
+
+class CreateFamilyRequest(BaseModel):
+    """创建家庭请求"""
+    name: str
+
+
+class JoinFamilyRequest(BaseModel):
+    """加入家庭请求"""
+    invite_code: str
+
+
+def family_data(family: Family) -> dict:
+    """家庭信息(只返回给成员,包含邀请码)"""
+    return {"id": family.id, "name": family.name, "invite_code": family.invite_code}
+
+
+@router.post("/families")
+def create_family(
+    request: CreateFamilyRequest,
+    user_id: int = Depends(verify_token),
+    session: Session = Depends(get_session)
+):
+    """
+    创建家庭,当前登录用户自动成为成员
+
+    Args:
+        request: 创建家庭请求
+        user_id: 当前登录用户ID
+        session: 数据库会话
+
+    Returns:
+        家庭信息(含邀请码,分享给家人用于加入)
+    """
+    name = request.name.strip()
+    if not name or len(name) > 50:
+        raise HTTPException(status_code=422, detail="家庭名称长度应为 1-50 个字符")
+
+    if session.get(User, user_id) is None:
+        raise HTTPException(status_code=404, detail="用户不存在")
+
+    family = Family(name=name, invite_code=secrets.token_urlsafe(12), created_by=user_id)
+    session.add(family)
+    session.flush()
+    session.add(FamilyMember(family_id=family.id, user_id=user_id))
+    session.commit()
+    session.refresh(family)
+
+    return {
+        "success": True,
+        "data": family_data(family),
+        "message": "家庭创建成功"
+    }
+
+
+@router.post("/families/{family_id}/members")
+def join_family(
+    family_id: int,
+    request: JoinFamilyRequest,
+    user_id: int = Depends(verify_token),
+    session: Session = Depends(get_session)
+):
+    """
+    当前登录用户凭邀请码加入家庭
+
+    Args:
+        family_id: 家庭ID
+        request: 加入家庭请求
+        user_id: 当前登录用户ID
+        session: 数据库会话
+
+    Returns:
+        家庭信息
+    """
+    family = session.get(Family, family_id)
+    if family is None:
+        raise HTTPException(status_code=404, detail="家庭不存在")
+
+    if not secrets.compare_digest(request.invite_code.encode(), family.invite_code.encode()):
+        raise HTTPException(status_code=403, detail="邀请码错误")
+
+    if session.get(User, user_id) is None:
+        raise HTTPException(status_code=404, detail="用户不存在")
+
+    session.add(FamilyMember(family_id=family_id, user_id=user_id))
+    try:
+        session.commit()
+    except IntegrityError:
+        # 已经是成员
+        session.rollback()
+
+    return {
+        "success": True,
+        "data": family_data(family),
+        "message": "已加入家庭"
+    }
+
+
+@router.get("/families")
+def get_user_families(
+    user_id: int = Depends(verify_token),
+    session: Session = Depends(get_session)
+):
+    """
+    获取当前登录用户加入的家庭
+
+    Args:
+        user_id: 当前登录用户ID
+        session: 数据库会话
+
+    Returns:
+        家庭列表
+    """
+    statement = (
+        select(Family)
+        .join(FamilyMember, FamilyMember.family_id == Family.id)
+        .where(FamilyMember.user_id == user_id)
+        .order_by(Family.id)
+    )
+    families = session.exec(statement).all()
+
+    return {
+        "success": True,
+        "data": [family_data(family) for family in families]
+    }
+
+
+@router.get("/leaderboard")
+def get_leaderboard(
+    period: str = "weekly",
+    family_id: Optional[int] = None,
+    day: Optional[str] = None,
+    limit: int = 10,
+    user_id: int = Depends(verify_token),
+    session: Session = Depends(get_session)
+):
+    """
+    获取排行榜
+
+    Args:
+        period: daily/weekly/all
+        family_id: 家庭ID,为空时为全站榜
+        day: 周期内的任意一天(YYYY-MM-DD),默认今天
+        limit: 返回前几名(1-100)
+        user_id: 当前登录用户ID(返回其名次)
+        session: 数据库会话
+
+    Returns:
+        前几名和当前用户的名次
+    """
+    if period not in PERIODS:
+        raise HTTPException(status_code=422, detail="period 不合法")
+
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=422, detail="limit 应为 1-100")
+
+    try:
+        target_day = date.fromisoformat(day) if day else date.today()
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"日期格式错误: {str(e)}")
+
+    member_ids = None
+    if family_id is not None:
+        member_ids = family_member_ids(session, family_id)
+        if user_id not in member_ids:
+            raise HTTPException(status_code=403, detail="不是该家庭的成员")
+
+    key = period_key(period, target_day)
+
+    return {
+        "success": True,
+        "data": {
+            "period": period,
+            "period_key": key,
+            "entries": top_entries(session, period, key, limit, member_ids),
+            "me": user_rank(session, period, key, user_id, member_ids)
+        }
+    }
@@ -1,16 +1,22 @@
 """饮食相关路由"""
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import date
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Union
 from pydantic import BaseModel
-from database import get_session
+from database import async_engine, get_session, get_async_session
 from models import MealRecord
-from services.diet import analyze_meal_health
+from config import settings
+from services.diet import analyze_meal_health, analyze_meals_health, stream_meal_analysis
+from services.trends import refresh_daily_summary
 import json
 
 router = APIRouter(prefix="/api/meals", tags=["meals"])
 
+MEAL_TYPES = ["breakfast", "lunch", "dinner", "snack"]
+
 
 class FoodItem(BaseModel):
     """食物条目"""
@@ -26,10 +32,57 @@ class AddMealRequest(BaseModel):
     date: str  # YYYY-MM-DD
 
 
+class MealEntry(BaseModel):
+    """批量记录中的一餐"""
+    meal_type: str  # breakfast/lunch/dinner/snack
+    food_items: List[FoodItem]
+
+
+class AddMealsBatchRequest(BaseModel):
+    """批量添加饮食记录请求(同一天的多餐)"""
+    user_id: int
+    meals: List[MealEntry]
+    date: str  # YYYY-MM-DD
+
+
+def validate_meal_request(request: Union[AddMealRequest, MealEntry]):
+    """校验餐次类型和食物列表"""
+    if request.meal_type not in MEAL_TYPES:
+        raise HTTPException(status_code=422, detail="meal_type 不合法")
+    
+    if not request.food_items:
+        raise HTTPException(status_code=400, detail="食物列表为空")
+
+
+def build_meal_record(user_id: int, meal_type: str, food_items_list: List[Dict],
+                      meal_date: date, analysis_result: Dict) -> MealRecord:
+    """根据分析结果构建饮食记录"""
+    return MealRecord(
+        user_id=user_id,
+        meal_type=meal_type,
+        food_items=json.dumps(food_items_list, ensure_ascii=False),
+        total_calories=analysis_result["total_calories"],
+        health_score=analysis_result["health_score"],
+        analysis=analysis_result["analysis"],
+        date=meal_date
+    )
+
+
+def meal_response_data(meal_record: MealRecord) -> Dict:
+    """饮食记录的返回格式"""
+    return {
+        "id": meal_record.id,
+        "meal_type": meal_record.meal_type,
+        "health_score": meal_record.health_score,
+        "total_calories": meal_record.total_calories,
+        "analysis": meal_record.analysis
+    }
+
+
 @router.post("/add")
 async def add_meal_record(
     request: AddMealRequest,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     添加饮食记录并分析
@@ -41,13 +94,8 @@ async def add_meal_record(
     Returns:
         分析结果
     """
-    # 验证餐次类型
-    if request.meal_type not in ["breakfast", "lunch", "dinner", "snack"]:
-        raise HTTPException(status_code=422, detail="meal_type 不合法")
-    
-    # 验证食物列表
-    if not request.food_items:
-        raise HTTPException(status_code=400, detail="食物列表为空")
+    # 验证餐次类型和食物列表
+    validate_meal_request(request)
     
     try:
         # 解析日期
@@ -57,32 +105,21 @@ async def add_meal_record(
         food_items_list = [item.dict() for item in request.food_items]
         
         # 调用AI分析服务
-        analysis_result = await analyze_meal_health(food_items_list)
+        analysis_result = await analyze_meal_health(food_items_list, user_id=request.user_id)
         
         # 保存到数据库
-        meal_record = MealRecord(
-            user_id=request.user_id,
-            meal_type=request.meal_type,
-            food_items=json.dumps(food_items_list, ensure_ascii=False),
-            total_calories=analysis_result["total_calories"],
-            health_score=analysis_result["health_score"],
-            analysis=analysis_result["analysis"],
-            date=meal_date
+        meal_record = build_meal_record(
+            request.user_id, request.meal_type, food_items_list, meal_date, analysis_result
         )
         
         session.add(meal_record)
-        session.commit()
-        session.refresh(meal_record)
+        await session.run_sync(refresh_daily_summary, request.user_id, meal_date)
+        await session.commit()
+        await session.refresh(meal_record)
         
         return {
             "success": True,
-            "data": {
-                "id": meal_record.id,
-                "meal_type": meal_record.meal_type,
-                "health_score": meal_record.health_score,
-                "total_calories": meal_record.total_calories,
-                "analysis": meal_record.analysis
-            },
+            "data": meal_response_data(meal_record),
             "message": "饮食记录成功"
         }
         
@@ -92,6 +129,117 @@ async def add_meal_record(
         raise HTTPException(status_code=500, detail=f"AI 分析失败: {str(e)}")
 
 
+@router.post("/add/batch")
+async def add_meal_records_batch(
+    request: AddMealsBatchRequest,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    批量添加一天的饮食记录
+    
+    需要模型分析的餐合并为一次调用,所有记录在一个事务中写入
+    
+    Args:
+        request: 批量饮食记录请求
+        session: 数据库会话
+    
+    Returns:
+        每餐的分析结果
+    """
+    if not request.meals:
+        raise HTTPException(status_code=400, detail="餐次列表为空")
+    
+    if len(request.meals) > settings.DIET_BATCH_MAX_MEALS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"单次最多记录 {settings.DIET_BATCH_MAX_MEALS} 餐"
+        )
+    
+    for meal in request.meals:
+        validate_meal_request(meal)
+    
+    try:
+        meal_date = date.fromisoformat(request.date)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"日期格式错误: {str(e)}")
+    
+    try:
+        food_items_lists = [[item.dict() for item in meal.food_items] for meal in request.meals]
+        analysis_results = await analyze_meals_health(food_items_lists, user_id=request.user_id)
+        
+        meal_records = [
+            build_meal_record(request.user_id, meal.meal_type, food_items_list, meal_date, analysis_result)
+            for meal, food_items_list, analysis_result in zip(request.meals, food_items_lists, analysis_results)
+        ]
+        
+        session.add_all(meal_records)
+        await session.run_sync(refresh_daily_summary, request.user_id, meal_date)
+        await session.commit()
+        
+        return {
+            "success": True,
+            "data": [meal_response_data(meal_record) for meal_record in meal_records],
+            "message": f"饮食记录成功 {len(meal_records)} 餐"
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"AI 分析失败: {str(e)}")
+
+
+def sse_event(event: str, data: Dict) -> str:
+    """Server-Sent Events 格式的一条消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/analyze/stream")
+async def add_meal_record_stream(request: AddMealRequest):
+    """
+    添加饮食记录并以 Server-Sent Events 推送分析进度
+    
+    模型每输出一个字段推送一条 field 事件(健康得分、卡路里最先到达),
+    分析完成并保存后推送 result 事件,失败时推送 error 事件
+    
+    Args:
+        request: 饮食记录请求
+    """
+    validate_meal_request(request)
+    
+    try:
+        meal_date = date.fromisoformat(request.date)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"日期格式错误: {str(e)}")
+    
+    food_items_list = [item.dict() for item in request.food_items]
+    
+    async def events() -> AsyncIterator[str]:
+        try:
+            analysis_result = None
+            async for event, data in stream_meal_analysis(food_items_list, user_id=request.user_id):
+                if event == "result":
+                    analysis_result = data
+                else:
+                    yield sse_event(event, data)
+            
+            # 响应开始后依赖注入的会话已关闭,这里单独打开
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                meal_record = build_meal_record(
+                    request.user_id, request.meal_type, food_items_list, meal_date, analysis_result
+                )
+                session.add(meal_record)
+                await session.run_sync(refresh_daily_summary, request.user_id, meal_date)
+                await session.commit()
+            
+            yield sse_event("result", meal_response_data(meal_record))
+        except Exception as e:
+            yield sse_event("error", {"detail": f"AI 分析失败: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/today")
 def get_today_meals(
     user_id: int,
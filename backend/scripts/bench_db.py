@@ -0,0 +1,107 @@
+"""
+SQLite 并发读写基准测试
+
+对比默认配置与 WAL + PRAGMA + 连接池调优后的并发吞吐。
+
+用法:
+    cd backend && python -m scripts.bench_db --writers 4 --readers 8 --seconds 5
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from sqlalchemy.exc import OperationalError
+from sqlmodel import SQLModel, Session, create_engine, select, func
+from database import build_engine
+from models import ExerciseRecord, User
+
+
+def default_engine(database_url: str):
+    """优化前的引擎配置"""
+    return create_engine(database_url, connect_args={"check_same_thread": False})
+
+
+def run_workload(engine, writers: int, readers: int, seconds: float) -> dict:
+    """并发执行写入和读取,返回各自的操作数和错误数"""
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(User(id=1, username="bench", password_hash="-", name="bench"))
+        session.commit()
+
+    counters = {"writes": 0, "reads": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+    today = date.today()
+
+    def writer():
+        n = 0
+        while time.perf_counter() < deadline:
+            try:
+                with Session(engine) as session:
+                    session.add(ExerciseRecord(
+                        user_id=1,
+                        exercise_type="跑步",
+                        duration_min=30,
+                        calories=300,
+                        steps=5000,
+                        source_device="huawei",
+                        date=today - timedelta(days=n % 30),
+                        score=30
+                    ))
+                    session.commit()
+                key = "writes"
+            except OperationalError:
+                key = "errors"
+            n += 1
+            with lock:
+                counters[key] += 1
+
+    def reader():
+        while time.perf_counter() < deadline:
+            try:
+                with Session(engine) as session:
+                    session.exec(
+                        select(ExerciseRecord.date, func.sum(ExerciseRecord.calories))
+                        .where(ExerciseRecord.user_id == 1, ExerciseRecord.date >= today - timedelta(days=29))
+                        .group_by(ExerciseRecord.date)
+                    ).all()
+                key = "reads"
+            except OperationalError:
+                key = "errors"
+            with lock:
+                counters[key] += 1
+
+    threads = [threading.Thread(target=writer) for _ in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    engine.dispose()
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite 并发读写基准测试")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, factory in (("default", default_engine), ("tuned", build_engine)):
+            database_url = f"sqlite:///{os.path.join(tmp, label + '.db')}"
+            result = run_workload(factory(database_url), args.writers, args.readers, args.seconds)
+            print(
+                f"{label:>8}: "
+                f"writes {result['writes'] / args.seconds:8.1f}/s  "
+                f"reads {result['reads'] / args.seconds:8.1f}/s  "
+                f"errors {result['errors']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
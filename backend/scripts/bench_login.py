@@ -0,0 +1,55 @@
+"""
+密码哈希/登录吞吐基准测试
+
+测量当前 KDF 参数下单核每秒可校验的密码数,以及通过密码哈希线程池
+并发校验时的总吞吐,用于选择 PASSWORD_SCRYPT_N / PASSWORD_PBKDF2_ITERATIONS。
+
+用法:
+    cd backend && python -m scripts.bench_login --count 50 --concurrency 8
+"""
+import argparse
+import asyncio
+import os
+import time
+from config import settings
+from services.passwords import hash_password, verify_password, verify_password_async
+
+
+async def run_concurrent(password: str, password_hash: str, count: int, concurrency: int) -> float:
+    """模拟登录高峰: concurrency 个请求同时校验,共 count 次"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_login():
+        async with semaphore:
+            assert await verify_password_async(password, password_hash)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_login() for _ in range(count)))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="密码哈希/登录吞吐基准测试")
+    parser.add_argument("--count", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    password = "correct horse battery staple"
+    password_hash = hash_password(password)
+    print(f"算法: {password_hash.rsplit('$', 2)[0]}")
+
+    started = time.perf_counter()
+    for _ in range(args.count):
+        verify_password(password, password_hash)
+    single = time.perf_counter() - started
+    print(f"单核: {args.count / single:.1f} 次/秒, 每次 {single / args.count * 1000:.1f} ms")
+
+    elapsed = asyncio.run(run_concurrent(password, password_hash, args.count, args.concurrency))
+    print(
+        f"线程池({settings.PASSWORD_HASH_WORKERS} 线程, {os.cpu_count()} 核, 并发 {args.concurrency}): "
+        f"{args.count / elapsed:.1f} 次/秒"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+对比本地估算与模型给出的饮食得分(启用 DIET_LOCAL_FAST_PATH 之前先在样本上校验)
+
+读取已有的饮食记录(得分来自模型),对能走本地快速通道的餐重新本地估算,
+输出两者的得分差异和热量差异,以及差异最大的几餐。
+注意只选模型分析的记录: 快速通道开启期间写入的记录本身就是本地估算结果,可用 --since 排除。
+
+用法:
+    cd backend && python -m scripts.compare_diet_scores [--since 2025-11-01] [--limit 1000] [--top 10]
+"""
+import argparse
+import json
+from datetime import date
+from sqlmodel import Session, select
+from database import engine, create_db_and_tables
+from models import MealRecord
+from services.nutrition import estimate_meal
+
+
+def compare_diet_scores(session: Session, since=None, limit: int = 1000) -> list:
+    """
+    本地估算与记录中的模型结果逐餐对比
+
+    Args:
+        session: 数据库会话
+        since: 只取该日期之后的记录
+        limit: 最多读取的记录数(按时间倒序)
+
+    Returns:
+        [(记录, 本地估算结果)],只包含能走本地快速通道的餐
+    """
+    statement = select(MealRecord).order_by(MealRecord.id.desc()).limit(limit)
+    if since is not None:
+        statement = statement.where(MealRecord.date >= since)
+
+    pairs = []
+    for record in session.exec(statement).all():
+        food_items = record.food_items
+        if isinstance(food_items, str):
+            food_items = json.loads(food_items)
+        local_result = estimate_meal(food_items)
+        if local_result is not None:
+            pairs.append((record, local_result))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比本地估算与模型的饮食得分")
+    parser.add_argument("--since", type=date.fromisoformat, default=None, help="只取该日期(YYYY-MM-DD)之后的记录")
+    parser.add_argument("--limit", type=int, default=1000, help="最多读取的记录数")
+    parser.add_argument("--top", type=int, default=10, help="列出差异最大的餐数")
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    with Session(engine) as session:
+        pairs = compare_diet_scores(session, args.since, args.limit)
+
+    if not pairs:
+        print("没有可以本地估算的饮食记录")
+        return
+
+    score_diffs = [local["health_score"] - record.health_score for record, local in pairs]
+    calorie_diffs = [
+        abs(local["total_calories"] - record.total_calories) / record.total_calories
+        for record, local in pairs if record.total_calories
+    ]
+    within = sum(1 for diff in score_diffs if abs(diff) <= 10)
+
+    print(f"✅ 可本地估算的餐 {len(pairs)} 条")
+    print(f"   得分平均绝对误差 {sum(abs(d) for d in score_diffs) / len(score_diffs):.1f},"
+          f"平均偏差 {sum(score_diffs) / len(score_diffs):+.1f},"
+          f"误差在 10 分以内 {within / len(pairs):.0%}")
+    if calorie_diffs:
+        print(f"   热量平均相对误差 {sum(calorie_diffs) / len(calorie_diffs):.0%}")
+
+    print(f"差异最大的 {args.top} 餐:")
+    for record, local in sorted(pairs, key=lambda pair: -abs(pair[1]["health_score"] - pair[0].health_score))[:args.top]:
+        food_items = record.food_items if isinstance(record.food_items, str) else json.dumps(record.food_items, ensure_ascii=False)
+        print(f"   #{record.id} 模型 {record.health_score} / 本地 {local['health_score']}  {food_items}")
+
+
+if __name__ == "__main__":
+    main()
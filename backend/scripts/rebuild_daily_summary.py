@@ -0,0 +1,27 @@
+"""
+根据原始记录重建每日汇总表
+
+用法:
+    cd backend && python -m scripts.rebuild_daily_summary [--user-id 1]
+"""
+import argparse
+import time
+from sqlmodel import Session
+from database import engine, create_db_and_tables
+from services.trends import rebuild_daily_summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重建每日汇总表")
+    parser.add_argument("--user-id", type=int, default=None, help="只重建指定用户")
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    started = time.perf_counter()
+    with Session(engine) as session:
+        count = rebuild_daily_summaries(session, args.user_id)
+    print(f"✅ 已重建每日汇总 {count} 条,耗时 {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
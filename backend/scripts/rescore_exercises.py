@@ -0,0 +1,118 @@
+"""
+按当前评分规则重算全部运动记录的得分
+
+分批读取记录、批量计算得分,只更新得分有变化的记录,最后重建受影响用户的每日汇总。
+
+用法:
+    cd backend && python -m scripts.rescore_exercises [--user-id 1] [--chunk-size 5000] [--dry-run]
+"""
+import argparse
+import time
+from sqlalchemy import bindparam, update
+from sqlmodel import Session, select
+from database import engine, create_db_and_tables
+from models import ExerciseRecord
+from services.score import calculate_scores
+from services.trends import rebuild_daily_summaries
+
+
+def rescore_exercises(session: Session, user_id=None, chunk_size: int = 5000, dry_run: bool = False) -> dict:
+    """
+    重算运动得分
+
+    Args:
+        session: 数据库会话
+        user_id: 只重算指定用户,为空时重算全部用户
+        chunk_size: 每批读取的记录数
+        dry_run: 只统计不写入
+
+    Returns:
+        扫描数、更新数和受影响的用户
+    """
+    table = ExerciseRecord.__table__
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam("record_id"))
+        .values(score=bindparam("new_score"))
+    )
+
+    scanned = updated = 0
+    affected_users = set()
+    last_id = 0
+    while True:
+        # 按主键分页,避免 OFFSET 越翻越慢
+        query = (
+            select(
+                ExerciseRecord.id,
+                ExerciseRecord.user_id,
+                ExerciseRecord.exercise_type,
+                ExerciseRecord.duration_min,
+                ExerciseRecord.calories,
+                ExerciseRecord.avg_heart_rate,
+                ExerciseRecord.steps,
+                ExerciseRecord.score
+            )
+            .where(ExerciseRecord.id > last_id)
+            .order_by(ExerciseRecord.id)
+            .limit(chunk_size)
+        )
+        if user_id is not None:
+            query = query.where(ExerciseRecord.user_id == user_id)
+
+        rows = session.exec(query).all()
+        if not rows:
+            break
+
+        ids, user_ids, exercise_types, durations, calories, heart_rates, steps, old_scores = zip(*rows)
+        new_scores = calculate_scores(exercise_types, durations, calories, heart_rates, steps)
+
+        changes = [
+            {"record_id": record_id, "new_score": new_score}
+            for record_id, new_score, old_score in zip(ids, new_scores, old_scores)
+            if new_score != old_score
+        ]
+        affected_users.update(
+            uid for uid, new_score, old_score in zip(user_ids, new_scores, old_scores)
+            if new_score != old_score
+        )
+
+        if changes and not dry_run:
+            # 一条 UPDATE 语句批量执行(executemany)
+            session.connection().execute(statement, changes)
+            session.commit()
+
+        scanned += len(rows)
+        updated += len(changes)
+        last_id = ids[-1]
+
+    return {"scanned": scanned, "updated": updated, "users": sorted(affected_users)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重算运动记录得分")
+    parser.add_argument("--user-id", type=int, default=None, help="只重算指定用户")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="每批处理的记录数")
+    parser.add_argument("--dry-run", action="store_true", help="只统计变化,不写入数据库")
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    started = time.perf_counter()
+    with Session(engine) as session:
+        result = rescore_exercises(session, args.user_id, args.chunk_size, args.dry_run)
+
+        # 得分变化后每日汇总随之变化
+        summaries = 0
+        if not args.dry_run:
+            for uid in result["users"]:
+                summaries += rebuild_daily_summaries(session, uid)
+
+    action = "需要更新" if args.dry_run else "已更新"
+    print(
+        f"✅ 扫描运动记录 {result['scanned']} 条,{action} {result['updated']} 条,"
+        f"涉及用户 {len(result['users'])} 个,重建每日汇总 {summaries} 条,"
+        f"耗时 {time.perf_counter() - started:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
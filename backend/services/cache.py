@@ -0,0 +1,226 @@
+"""AI 结果缓存服务(TTL + LRU)"""
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+from sqlalchemy import delete
+from sqlmodel import Session, select, func
+from config import settings
+from database import engine
+from models import CacheEntry
+
+
+class ResultCache:
+    """缓存基类,负责命中统计和并发去重"""
+
+    def __init__(self, namespace: str, ttl: int, max_entries: int):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # 同一 key 正在计算中的任务(重复上传只调用一次 API)
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def size(self) -> int:
+        raise NotImplementedError
+
+    async def aget(self, key: str) -> Optional[Any]:
+        return self.get(key)
+
+    async def aset(self, key: str, value: Any):
+        self.set(key, value)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        读取缓存,未命中时调用 compute 计算并写入
+
+        Args:
+            key: 缓存键
+            compute: 计算结果的协程函数,抛出异常时不写入缓存
+
+        Returns:
+            缓存或新计算的结果
+        """
+        value = await self.aget(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        # 相同 key 已在计算中,等待同一个结果
+        task = self._inflight.get(key)
+        if task is not None:
+            self.hits += 1
+            return await asyncio.shield(task)
+
+        self.misses += 1
+        task = asyncio.ensure_future(compute())
+        self._inflight[key] = task
+        try:
+            value = await asyncio.shield(task)
+        finally:
+            self._inflight.pop(key, None)
+
+        await self.aset(key, value)
+        return value
+
+    def stats(self) -> Dict:
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "size": self.size(),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl
+        }
+
+
+class MemoryCache(ResultCache):
+    """进程内缓存"""
+
+    backend = "memory"
+
+    def __init__(self, namespace: str, ttl: int, max_entries: int):
+        super().__init__(namespace, ttl, max_entries)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if time.monotonic() > expires_at:
+            del self._entries[key]
+            return None
+
+        # 最近使用移到末尾
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+
+        # 超出容量时淘汰最久未使用的条目
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class DatabaseCache(ResultCache):
+    """数据库表缓存,重启后仍然有效"""
+
+    backend = "database"
+
+    def get(self, key: str) -> Optional[Any]:
+        with Session(engine) as session:
+            entry = session.get(CacheEntry, (self.namespace, key))
+            if entry is None:
+                return None
+
+            now = datetime.now()
+            if now > entry.expires_at:
+                session.delete(entry)
+                session.commit()
+                return None
+
+            entry.accessed_at = now
+            session.add(entry)
+            session.commit()
+            return json.loads(entry.value)
+
+    def set(self, key: str, value: Any):
+        now = datetime.now()
+        with Session(engine) as session:
+            session.merge(CacheEntry(
+                namespace=self.namespace,
+                key=key,
+                value=json.dumps(value, ensure_ascii=False),
+                expires_at=now + timedelta(seconds=self.ttl),
+                accessed_at=now
+            ))
+            session.commit()
+
+            # 清理过期条目,并按最近访问时间淘汰超出容量的部分
+            session.execute(delete(CacheEntry).where(
+                CacheEntry.namespace == self.namespace,
+                CacheEntry.expires_at < now
+            ))
+            count = session.exec(
+                select(func.count()).select_from(CacheEntry).where(CacheEntry.namespace == self.namespace)
+            ).one()
+            if count > self.max_entries:
+                stale_keys = select(CacheEntry.key).where(
+                    CacheEntry.namespace == self.namespace
+                ).order_by(CacheEntry.accessed_at).limit(count - self.max_entries)
+                session.execute(delete(CacheEntry).where(
+                    CacheEntry.namespace == self.namespace,
+                    CacheEntry.key.in_(stale_keys)
+                ))
+            session.commit()
+
+    def clear(self):
+        with Session(engine) as session:
+            session.execute(delete(CacheEntry).where(CacheEntry.namespace == self.namespace))
+            session.commit()
+
+    def size(self) -> int:
+        with Session(engine) as session:
+            return session.exec(
+                select(func.count()).select_from(CacheEntry).where(CacheEntry.namespace == self.namespace)
+            ).one()
+
+    async def aget(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Any):
+        await asyncio.to_thread(self.set, key, value)
+
+
+# 已创建的缓存(用于统计输出)
+_caches: Dict[str, ResultCache] = {}
+
+
+def create_cache(namespace: str, ttl: int, max_entries: int) -> ResultCache:
+    """
+    按配置创建缓存
+
+    Args:
+        namespace: 缓存命名空间
+        ttl: 过期时间(秒)
+        max_entries: 最大条目数
+
+    Returns:
+        缓存实例
+    """
+    if settings.CACHE_BACKEND == "database":
+        cache = DatabaseCache(namespace, ttl, max_entries)
+    else:
+        cache = MemoryCache(namespace, ttl, max_entries)
+    _caches[namespace] = cache
+    return cache
+
+
+def cache_stats() -> Dict[str, Dict]:
+    """所有缓存的命中统计"""
+    return {namespace: cache.stats() for namespace, cache in _caches.items()}
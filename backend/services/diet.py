@@ -1,10 +1,26 @@
 """饮食健康分析服务"""
+import hashlib
 import json
-import httpx
-from typing import Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from config import settings
+from services.cache import create_cache
+from services.jsonstream import IncrementalJSONParser
+from services.qwen import post_chat_completion, stream_chat_completion
+from services.nutrition import estimate_meal, normalize_amount, normalize_food_name
 
 
+# 评分标准(单餐和批量分析共用)
+DIET_SCORING_RUBRIC = """评分标准:
+- 营养均衡(蛋白质+碳水+蔬菜): 基础分 60
+- 蔬菜丰富: +10 分
+- 高蛋白: +5 分
+- 少油少盐: +10 分
+- 无糖饮料/甜食: +10 分
+- 全谷物主食: +5 分
+- 油炸食品: -15 分
+- 高糖饮料/甜食: -10 分
+- 加工肉类过多: -10 分"""
+
 # 饮食分析提示词
 DIET_ANALYSIS_PROMPT = """你是一位营养专家,请分析以下这餐的营养健康度。
 
@@ -26,42 +42,234 @@ DIET_ANALYSIS_PROMPT = """你是一位营养专家,请分析以下这餐的营
   }}
 }}
 
-评分标准:
-- 营养均衡(蛋白质+碳水+蔬菜): 基础分 60
-- 蔬菜丰富: +10 分
-- 高蛋白: +5 分
-- 少油少盐: +10 分
-- 无糖饮料/甜食: +10 分
-- 全谷物主食: +5 分
-- 油炸食品: -15 分
-- 高糖饮料/甜食: -10 分
-- 加工肉类过多: -10 分"""
+""" + DIET_SCORING_RUBRIC
+
+# 批量饮食分析提示词(一次分析一天的多餐,评分标准只出现一次)
+DIET_BATCH_ANALYSIS_PROMPT = """你是一位营养专家,请分别分析以下 {meal_count} 餐的营养健康度,每餐单独评分。
+
+{meals}
+
+请按餐的序号返回 JSON 数组,每餐一个对象:
+
+[
+  {{
+    "meal": 餐的序号(整数),
+    "health_score": 健康得分(0-100,整数),
+    "total_calories": 估算总卡路里(整数),
+    "analysis": "简短的健康分析和建议(50字以内)",
+    "nutrition_balance": {{
+      "protein": "蛋白质充足/适中/不足",
+      "carbs": "碳水化合物充足/适中/不足",
+      "vegetables": "蔬菜充足/适中/不足",
+      "oil": "油脂过多/适中/较少",
+      "sugar": "糖分过多/适中/较少"
+    }}
+  }}
+]
+
+""" + DIET_SCORING_RUBRIC
+
+# 流式分析时收齐这些字段就断开,不等模型输出结尾
+# (提示词中排在前面; 最后的 nutrition_balance 不等,由本地估算补齐)
+DIET_REQUIRED_FIELDS = ("health_score", "total_calories", "analysis")
+
+# 提示词版本,提示词或模型变化后旧缓存自动失效
+# 单餐和批量分析的结果写入同一缓存,两个提示词都计入版本
+DIET_PROMPT_VERSION = hashlib.sha256(
+    f"{settings.DIET_MODEL}\n{DIET_ANALYSIS_PROMPT}\n{DIET_BATCH_ANALYSIS_PROMPT}".encode()
+).hexdigest()[:16]
 
+# 饮食分析结果缓存(按规范化的食物列表)
+analysis_cache = create_cache(
+    "diet",
+    ttl=settings.DIET_CACHE_TTL,
+    max_entries=settings.DIET_CACHE_MAX_ENTRIES
+)
 
-async def analyze_meal_health(food_items: List[Dict]) -> Dict:
+def canonical_food_items(food_items: List[Dict]) -> List[Tuple[str, str]]:
+    """食物列表的规范形式(与顺序无关)"""
+    return sorted(
+        (normalize_food_name(item["name"]), normalize_amount(item["amount"]))
+        for item in food_items
+    )
+
+
+def meal_cache_key(food_items: List[Dict]) -> str:
+    """根据规范化的食物列表和提示词版本生成缓存键"""
+    canonical = json.dumps(canonical_food_items(food_items), ensure_ascii=False)
+    return hashlib.sha256(f"{DIET_PROMPT_VERSION}\n{canonical}".encode()).hexdigest()
+
+
+# 本地估算统计
+nutrition_stats = {
+    "local_fast_path": 0,
+    "local_fallback": 0
+}
+
+
+async def analyze_meal_health(food_items: List[Dict], user_id: Optional[int] = None) -> Dict:
     """
     分析饮食健康度
     
+    全部是常见食物时直接用本地成分表估算,否则调用模型;模型失败时用本地估算兜底
+    
     Args:
         food_items: 食物列表,格式: [{"name": "食物名", "amount": "份量"}, ...]
+        user_id: 用户ID(用于单用户并发限制)
     
     Returns:
         包含健康得分、卡路里、分析等信息的字典
+    """
+    if settings.DIET_LOCAL_FAST_PATH:
+        local_result = estimate_meal(food_items)
+        if local_result is not None:
+            nutrition_stats["local_fast_path"] += 1
+            return local_result
+    
+    try:
+        # 相同的一餐直接返回缓存结果
+        return await analysis_cache.get_or_compute(
+            meal_cache_key(food_items),
+            lambda: _request_meal_analysis(food_items, user_id)
+        )
+    except Exception as e:
+        print(f"饮食分析失败,使用本地估算: {str(e)}")
+        return fallback_meal_analysis(food_items)
+
+
+def fallback_meal_analysis(food_items: List[Dict]) -> Dict:
+    """模型失败时的兜底结果: 本地估算(不写入缓存),无法估算时返回默认结果"""
+    local_result = estimate_meal(food_items, allow_unknown=True)
+    if local_result is None:
+        return default_meal_analysis()
+    nutrition_stats["local_fallback"] += 1
+    return local_result
+
+
+async def analyze_meals_health(meals: List[List[Dict]], user_id: Optional[int] = None) -> List[Dict]:
+    """
+    一次分析多餐(如一天的早中晚餐)
+    
+    本地估算和缓存命中的餐不再调用模型,其余的合并到一个提示词中分析,
+    每餐的结果分别校验并写入单餐缓存;某餐缺少结果或调用失败时用本地估算兜底
+    
+    Args:
+        meals: 每餐的食物列表
+        user_id: 用户ID
+    
+    Returns:
+        与 meals 顺序一致的分析结果
+    """
+    results: List[Optional[Dict]] = [None] * len(meals)
+    pending: List[int] = []
+    
+    for index, food_items in enumerate(meals):
+        if settings.DIET_LOCAL_FAST_PATH:
+            local_result = estimate_meal(food_items)
+            if local_result is not None:
+                nutrition_stats["local_fast_path"] += 1
+                results[index] = local_result
+                continue
+        
+        cached = await analysis_cache.aget(meal_cache_key(food_items))
+        if cached is not None:
+            analysis_cache.hits += 1
+            results[index] = cached
+            continue
+        
+        pending.append(index)
+    
+    if len(pending) == 1:
+        # 只剩一餐时按单餐分析(共享进行中的相同请求,由 get_or_compute 统计未命中)
+        index = pending[0]
+        results[index] = await analyze_meal_health(meals[index], user_id=user_id)
+    elif pending:
+        analysis_cache.misses += len(pending)
+        try:
+            analyzed = await _request_batch_analysis([meals[index] for index in pending], user_id)
+        except Exception as e:
+            print(f"批量饮食分析失败,使用本地估算: {str(e)}")
+            analyzed = [None] * len(pending)
+        
+        for index, result in zip(pending, analyzed):
+            if result is None:
+                results[index] = fallback_meal_analysis(meals[index])
+            else:
+                results[index] = result
+                await analysis_cache.aset(meal_cache_key(meals[index]), result)
+    
+    return results
+
+
+async def _request_batch_analysis(meals: List[List[Dict]], user_id: Optional[int] = None) -> List[Optional[Dict]]:
+    """
+    调用千问模型一次分析多餐
+    
+    Args:
+        meals: 每餐的食物列表
+        user_id: 用户ID
+    
+    Returns:
+        与 meals 顺序一致的校验后结果,模型漏掉的餐为 None
     
     Raises:
-        Exception: 分析失败时抛出异常
+        Exception: 调用或解析失败时抛出异常
     """
+    meals_text = "\n\n".join(
+        f"第 {number} 餐:\n" + "\n".join(f"- {item['name']} {item['amount']}" for item in food_items)
+        for number, food_items in enumerate(meals, start=1)
+    )
+    prompt = DIET_BATCH_ANALYSIS_PROMPT.format(meal_count=len(meals), meals=meals_text)
+    
+    payload = {
+        "model": settings.DIET_MODEL,
+        "messages": [
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "temperature": settings.DIET_TEMPERATURE,
+        # 每餐的输出长度与单餐分析相同,不超过模型的最大输出长度
+        "max_tokens": min(settings.DIET_MAX_TOKENS * len(meals), 8192)
+    }
+    
+    response = await post_chat_completion(payload, timeout=settings.DIET_TIMEOUT, user_id=user_id)
+    
+    if response.status_code != 200:
+        raise Exception(f"API 调用失败: {response.status_code}")
+    
+    content = response.json()["choices"][0]["message"]["content"]
+    
+    # 提取 JSON 数组部分
+    json_start = content.find('[')
+    json_end = content.rfind(']') + 1
+    if json_start == -1 or json_end == 0:
+        raise ValueError("无法从响应中提取 JSON 数据")
+    items = json.loads(content[json_start:json_end])
+    if not isinstance(items, list):
+        raise ValueError("批量分析结果不是数组")
+    
+    # 按序号对应到每餐,没有序号时按顺序对应
+    results: List[Optional[Dict]] = [None] * len(meals)
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        number = item.get("meal")
+        index = number - 1 if isinstance(number, int) else position
+        if 0 <= index < len(meals) and results[index] is None:
+            results[index] = validate_meal_analysis(item)
+    
+    return results
+
+
+def _meal_analysis_payload(food_items: List[Dict]) -> Dict:
+    """构建饮食分析的请求体"""
     # 格式化食物列表为文本
     food_text = "\n".join([f"- {item['name']} {item['amount']}" for item in food_items])
     prompt = DIET_ANALYSIS_PROMPT.format(food_items=food_text)
     
-    # 构建 API 请求
-    headers = {
-        "Authorization": f"Bearer {settings.QWEN_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
+    return {
         "model": settings.DIET_MODEL,
         "messages": [
             {
@@ -72,51 +280,162 @@ async def analyze_meal_health(food_items: List[Dict]) -> Dict:
         "temperature": settings.DIET_TEMPERATURE,
         "max_tokens": settings.DIET_MAX_TOKENS
     }
+
+
+async def _request_meal_analysis(food_items: List[Dict], user_id: Optional[int] = None) -> Dict:
+    """
+    调用千问模型分析一餐
     
+    Args:
+        food_items: 食物列表
+        user_id: 用户ID
+    
+    Returns:
+        验证后的分析结果
+    
+    Raises:
+        Exception: 分析失败时抛出异常
+    """
+    if settings.DIET_STREAM:
+        data = {}
+        async for name, value in _stream_meal_fields(food_items, user_id):
+            data[name] = value
+        return validate_meal_analysis(_fill_nutrition_balance(data, food_items))
+    
+    # 调用千问 API(共享连接池)
+    response = await post_chat_completion(
+        _meal_analysis_payload(food_items), timeout=settings.DIET_TIMEOUT, user_id=user_id
+    )
+    
+    if response.status_code != 200:
+        raise Exception(f"API 调用失败: {response.status_code}")
+    
+    result = response.json()
+    
+    # 解析返回的 JSON
+    content = result["choices"][0]["message"]["content"]
+    
+    # 提取 JSON 部分
+    json_start = content.find('{')
+    json_end = content.rfind('}') + 1
+    if json_start != -1 and json_end != 0:
+        json_str = content[json_start:json_end]
+        data = json.loads(json_str)
+    else:
+        raise ValueError("无法从响应中提取 JSON 数据")
+    
+    # 验证数据
+    return validate_meal_analysis(data)
+
+
+async def _stream_meal_fields(food_items: List[Dict],
+                              user_id: Optional[int] = None) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    流式调用模型,每解析出一个顶层字段立即返回,必填字段收齐后断开连接
+    
+    Args:
+        food_items: 食物列表
+        user_id: 用户ID
+    
+    Yields:
+        (字段名, 原始值)
+    
+    Raises:
+        ValueError: 模型输出中没有得分和卡路里
+    """
+    parser = IncrementalJSONParser()
+    chunks = stream_chat_completion(
+        _meal_analysis_payload(food_items), timeout=settings.DIET_TIMEOUT, user_id=user_id
+    )
     try:
-        # 调用千问 API
-        async with httpx.AsyncClient(timeout=settings.API_TIMEOUT) as client:
-            response = await client.post(
-                f"{settings.QWEN_API_URL}/chat/completions",
-                headers=headers,
-                json=payload
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"API 调用失败: {response.status_code}")
-            
-            result = response.json()
-        
-        # 解析返回的 JSON
-        content = result["choices"][0]["message"]["content"]
-        
-        # 提取 JSON 部分
-        json_start = content.find('{')
-        json_end = content.rfind('}') + 1
-        if json_start != -1 and json_end != 0:
-            json_str = content[json_start:json_end]
-            data = json.loads(json_str)
-        else:
-            raise ValueError("无法从响应中提取 JSON 数据")
-        
-        # 验证数据
-        validated_data = validate_meal_analysis(data)
-        return validated_data
-        
+        async for chunk in chunks:
+            for name, value in parser.feed(chunk):
+                yield name, value
+            if parser.complete or all(field in parser.fields for field in DIET_REQUIRED_FIELDS):
+                break
+    finally:
+        # 提前结束时关闭连接,模型停止生成
+        await chunks.aclose()
+    
+    if "health_score" not in parser.fields or "total_calories" not in parser.fields:
+        raise ValueError("无法从响应中提取 JSON 数据")
+
+
+def _fill_nutrition_balance(data: Dict, food_items: List[Dict]) -> Dict:
+    """流式提前断开时模型还没输出营养平衡,用本地成分表估算补齐"""
+    if "nutrition_balance" not in data:
+        local_result = estimate_meal(food_items, allow_unknown=True)
+        if local_result is not None:
+            data["nutrition_balance"] = local_result["nutrition_balance"]
+    return data
+
+
+async def stream_meal_analysis(food_items: List[Dict],
+                               user_id: Optional[int] = None) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    流式分析饮食健康度,供 SSE 接口边分析边推送
+    
+    本地估算或缓存命中时直接返回结果;否则模型每输出一个字段推送一次,
+    最后推送与 analyze_meal_health 相同的完整结果。模型失败时用本地估算兜底
+    
+    Args:
+        food_items: 食物列表,格式: [{"name": "食物名", "amount": "份量"}, ...]
+        user_id: 用户ID
+    
+    Yields:
+        ("field", {字段名: 值}) 或 ("result", 分析结果)
+    """
+    if settings.DIET_LOCAL_FAST_PATH:
+        local_result = estimate_meal(food_items)
+        if local_result is not None:
+            nutrition_stats["local_fast_path"] += 1
+            yield "result", local_result
+            return
+    
+    key = meal_cache_key(food_items)
+    cached = await analysis_cache.aget(key)
+    if cached is not None:
+        analysis_cache.hits += 1
+        yield "result", cached
+        return
+    analysis_cache.misses += 1
+    
+    data = {}
+    try:
+        async for name, value in _stream_meal_fields(food_items, user_id):
+            data[name] = value
+            if name in DIET_REQUIRED_FIELDS:
+                # 单个字段也按完整结果的规则校验
+                yield "field", {name: validate_meal_analysis({name: value})[name]}
     except Exception as e:
-        # 返回默认值
-        return {
-            "health_score": 50,
-            "total_calories": 0,
-            "analysis": "分析失败,请稍后重试",
-            "nutrition_balance": {
-                "protein": "未知",
-                "carbs": "未知",
-                "vegetables": "未知",
-                "oil": "未知",
-                "sugar": "未知"
-            }
+        print(f"饮食分析失败,使用本地估算: {str(e)}")
+        local_result = estimate_meal(food_items, allow_unknown=True)
+        if local_result is None:
+            yield "result", default_meal_analysis()
+        else:
+            nutrition_stats["local_fallback"] += 1
+            yield "result", local_result
+        return
+    
+    result = validate_meal_analysis(_fill_nutrition_balance(data, food_items))
+    await analysis_cache.aset(key, result)
+    yield "result", result
+
+
+def default_meal_analysis() -> Dict:
+    """分析失败时的默认结果"""
+    return {
+        "health_score": 50,
+        "total_calories": 0,
+        "analysis": "分析失败,请稍后重试",
+        "nutrition_balance": {
+            "protein": "未知",
+            "carbs": "未知",
+            "vegetables": "未知",
+            "oil": "未知",
+            "sugar": "未知"
         }
+    }
 
 
 def validate_meal_analysis(data: Dict) -> Dict:
@@ -145,7 +464,7 @@ def validate_meal_analysis(data: Dict) -> Dict:
         analysis = ""
     
     # 营养平衡验证
-    nutrition_balance = data.get("nutrition_balance", {})
+    nutrition_balance = data.get("nutrition_balance")
     if not isinstance(nutrition_balance, dict):
         nutrition_balance = {
             "protein": "适中",
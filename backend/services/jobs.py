@@ -0,0 +1,283 @@
+"""后台任务队列服务(数据库持久化,重启后继续执行)"""
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from sqlalchemy import and_, delete, or_, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from config import settings
+from database import async_engine
+from models import Job
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+# 任务类型 -> 处理函数(在传入的会话中写库,由队列与任务状态一起提交)
+_handlers: Dict[str, Callable[[AsyncSession, Job], Awaitable[Dict]]] = {}
+
+# 任务类型 -> 结束后的清理函数(删除临时文件等)
+_cleanups: Dict[str, Callable[[Job], None]] = {}
+
+# 本进程有新任务时唤醒 worker(在 start_workers 中按当前事件循环创建)
+_wakeup: Optional[asyncio.Event] = None
+
+# 本进程有任务状态变化时通知等待结果的请求
+_changed: Optional[asyncio.Condition] = None
+
+
+def job_handler(kind: str, cleanup: Optional[Callable[[Job], None]] = None):
+    """
+    注册任务处理函数
+
+    Args:
+        kind: 任务类型
+        cleanup: 任务结束(成功或最终失败)后调用
+    """
+    def decorator(func):
+        _handlers[kind] = func
+        if cleanup is not None:
+            _cleanups[kind] = cleanup
+        return func
+    return decorator
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+async def enqueue_job(session: AsyncSession, kind: str, user_id: int, payload: Dict,
+                      job_id: Optional[str] = None) -> Job:
+    """
+    创建任务并唤醒 worker
+
+    Args:
+        session: 数据库会话
+        kind: 任务类型
+        user_id: 用户ID
+        payload: 任务参数(可 JSON 序列化)
+        job_id: 任务ID,为空时自动生成
+
+    Returns:
+        已提交的任务
+    """
+    job = Job(
+        id=job_id or new_job_id(),
+        kind=kind,
+        user_id=user_id,
+        payload=json.dumps(payload, ensure_ascii=False)
+    )
+    session.add(job)
+    await session.commit()
+    if _wakeup is not None:
+        _wakeup.set()
+    return job
+
+
+def job_view(job: Job) -> Dict:
+    """任务状态的返回格式"""
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+
+
+def _claimable(now: datetime):
+    # 排队中,或执行超时(进程退出/崩溃)的任务
+    return or_(
+        Job.status == "queued",
+        and_(Job.status == "running", Job.lease_expires_at < now)
+    )
+
+
+async def claim_job() -> Optional[Job]:
+    """
+    领取最早的一个任务
+
+    条件更新保证多个 worker(包括其他进程)不会领取同一个任务
+    """
+    now = datetime.now()
+    candidate = select(Job.id).where(
+        _claimable(now)
+    ).order_by(Job.created_at).limit(1).scalar_subquery()
+
+    statement = update(Job).where(Job.id == candidate, _claimable(now)).values(
+        status="running",
+        attempts=Job.attempts + 1,
+        lease_expires_at=now + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    ).returning(Job.id).execution_options(synchronize_session=False)
+
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        job_id = (await session.execute(statement)).scalar()
+        await session.commit()
+        if job_id is None:
+            return None
+        return await session.get(Job, job_id)
+
+
+def _finish_statement(job: Job, status: str, result: Optional[Dict] = None, error: Optional[str] = None):
+    # 只有仍持有租约(没有被其他 worker 重新领取)时才写入结果
+    return update(Job).where(
+        Job.id == job.id,
+        Job.status == "running",
+        Job.attempts == job.attempts
+    ).values(
+        status=status,
+        result=json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+        error=error,
+        lease_expires_at=None,
+        finished_at=datetime.now()
+    ).execution_options(synchronize_session=False)
+
+
+async def _notify_changed():
+    if _changed is None:
+        return
+    async with _changed:
+        _changed.notify_all()
+
+
+async def run_job(job: Job):
+    """执行任务,处理函数的写库与任务完成在同一事务中提交"""
+    finished = True
+    try:
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            handler = _handlers.get(job.kind)
+            try:
+                if job.attempts > settings.JOB_MAX_ATTEMPTS:
+                    raise ValueError("任务多次执行超时")
+                if handler is None:
+                    raise ValueError(f"未知的任务类型: {job.kind}")
+                result = await handler(session, job)
+                outcome = await session.execute(_finish_statement(job, "succeeded", result=result))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await session.rollback()
+                outcome = await session.execute(_finish_statement(job, "failed", error=str(e)))
+
+            if outcome.rowcount:
+                await session.commit()
+            else:
+                # 租约已过期并被重新领取,结果以新的执行为准
+                await session.rollback()
+                finished = False
+    except asyncio.CancelledError:
+        # 进程关闭: 放回队列,重启后继续执行
+        finished = False
+        async with AsyncSession(async_engine) as session:
+            await session.execute(update(Job).where(Job.id == job.id, Job.status == "running").values(
+                status="queued",
+                attempts=Job.attempts - 1,
+                lease_expires_at=None
+            ))
+            await session.commit()
+        raise
+    finally:
+        if finished and job.kind in _cleanups:
+            try:
+                _cleanups[job.kind](job)
+            except Exception as e:
+                print(f"任务清理失败: {str(e)}")
+
+    await _notify_changed()
+
+
+async def _worker():
+    while True:
+        _wakeup.clear()
+        try:
+            job = await claim_job()
+        except Exception as e:
+            print(f"领取任务失败: {str(e)}")
+            job = None
+
+        if job is None:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), settings.JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        await run_job(job)
+
+
+async def purge_finished_jobs(interval: int = 3600):
+    """后台定期删除超过保留时间的已完成任务"""
+    while True:
+        try:
+            cutoff = datetime.now() - timedelta(hours=settings.JOB_RETENTION_HOURS)
+            async with AsyncSession(async_engine) as session:
+                await session.execute(delete(Job).where(
+                    Job.status.in_(TERMINAL_STATUSES),
+                    Job.finished_at < cutoff
+                ))
+                await session.commit()
+        except Exception as e:
+            print(f"任务清理失败: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+def start_workers() -> List[asyncio.Task]:
+    """启动本进程的任务 worker(在应用生命周期内运行)"""
+    global _wakeup, _changed
+    _wakeup = asyncio.Event()
+    _changed = asyncio.Condition()
+    tasks = [asyncio.create_task(_worker()) for _ in range(settings.JOB_WORKERS)]
+    tasks.append(asyncio.create_task(purge_finished_jobs()))
+    return tasks
+
+
+async def stop_workers(tasks: List[asyncio.Task]):
+    """停止 worker,执行中的任务放回队列"""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def get_job(job_id: str) -> Optional[Job]:
+    async with AsyncSession(async_engine) as session:
+        return await session.get(Job, job_id)
+
+
+async def job_event_stream(job_id: str) -> AsyncIterator[str]:
+    """
+    以 Server-Sent Events 格式推送任务状态,任务结束后关闭
+
+    本进程的任务完成时立即推送,其他进程执行的任务按 JOB_POLL_INTERVAL 轮询
+    """
+    last_status = None
+    last_sent = time.monotonic()
+
+    while True:
+        job = await get_job(job_id)
+        if job is None:
+            yield f"event: error\ndata: {json.dumps({'detail': '任务不存在'}, ensure_ascii=False)}\n\n"
+            return
+
+        if job.status != last_status:
+            last_status = job.status
+            last_sent = time.monotonic()
+            event = "result" if job.status in TERMINAL_STATUSES else "status"
+            yield f"event: {event}\ndata: {json.dumps(job_view(job), ensure_ascii=False)}\n\n"
+            if job.status in TERMINAL_STATUSES:
+                return
+        elif time.monotonic() - last_sent > 15:
+            # 保持连接,避免被代理断开
+            last_sent = time.monotonic()
+            yield ": keepalive\n\n"
+
+        if _changed is None:
+            await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+            continue
+        async with _changed:
+            try:
+                await asyncio.wait_for(_changed.wait(), settings.JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,88 @@
+"""增量 JSON 解析(流式模型输出边收边解析)"""
+import json
+from typing import Any, Dict, List, Tuple
+
+
+class IncrementalJSONParser:
+    """
+    增量解析模型输出中的第一个 JSON 对象
+
+    每收到一段文本调用一次 feed,顶层字段的值完整后立即返回,
+    不必等整个对象(以及对象后面的多余文字)生成完毕。
+    对象前的 markdown 代码块标记等文字会被跳过。
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.complete = False
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        # 当前顶层字段("key": value)在缓冲区中的起点
+        self._field_start = -1
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """
+        追加一段文本
+
+        Args:
+            text: 模型新输出的文本
+
+        Returns:
+            本次新解析出的顶层字段 [(字段名, 值)]
+        """
+        if self.complete:
+            return []
+
+        self._buffer += text
+        parsed: List[Tuple[str, Any]] = []
+
+        while self._pos < len(self._buffer):
+            char = self._buffer[self._pos]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if self._depth == 0:
+                # 跳过对象之前的文字
+                if char == "{":
+                    self._depth = 1
+                    self._field_start = self._pos
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    parsed.extend(self._take_field(self._pos - 1))
+                    self.complete = True
+                    break
+            elif char == "," and self._depth == 1:
+                parsed.extend(self._take_field(self._pos - 1))
+                self._field_start = self._pos
+
+        return parsed
+
+    def _take_field(self, end: int) -> List[Tuple[str, Any]]:
+        segment = self._buffer[self._field_start:end].strip()
+        if not segment:
+            return []
+        try:
+            field = json.loads("{" + segment + "}")
+        except json.JSONDecodeError:
+            # 格式错误的字段跳过,由调用方按缺失处理
+            return []
+        self.fields.update(field)
+        return list(field.items())
@@ -0,0 +1,176 @@
+"""排行榜服务(每日/每周/总积分)"""
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select, func
+from models import DailySummary, FamilyMember, LeaderboardEntry, User
+
+# 排行榜周期
+PERIODS = ("daily", "weekly", "all")
+
+
+def period_key(period: str, day: date) -> str:
+    """
+    某一天所属周期的键
+
+    Returns:
+        daily: 2025-11-10 / weekly: 2025-W46(ISO 周) / all: all
+    """
+    if period == "daily":
+        return day.isoformat()
+    if period == "weekly":
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    return "all"
+
+
+def credit_points(session: Session, user_id: int, day: date, points: int):
+    """
+    给用户某一天的积分加上 points(可为负),同时累加日/周/总榜和 User.total_score
+
+    积分即每日综合得分,由 refresh_daily_summary 在得分变化时按差值调用;
+    在写入记录的同一事务中执行,由调用方提交
+
+    Args:
+        session: 数据库会话
+        user_id: 用户ID
+        day: 积分所属日期
+        points: 积分变化
+    """
+    if not points:
+        return
+
+    now = datetime.now()
+    rows = [
+        {"period": period, "period_key": period_key(period, day), "user_id": user_id,
+         "points": points, "updated_at": now}
+        for period in PERIODS
+    ]
+
+    dialect = session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        statement = insert(LeaderboardEntry).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=["period", "period_key", "user_id"],
+            set_={
+                "points": LeaderboardEntry.points + statement.excluded.points,
+                "updated_at": statement.excluded.updated_at
+            }
+        )
+        session.execute(statement)
+    else:
+        for row in rows:
+            entry = session.get(LeaderboardEntry, (row["period"], row["period_key"], user_id))
+            if entry is None:
+                session.add(LeaderboardEntry(**row))
+            else:
+                entry.points += points
+                entry.updated_at = now
+                session.add(entry)
+
+    session.execute(
+        update(User).where(User.id == user_id).values(total_score=User.total_score + points)
+    )
+
+
+def rebuild_leaderboard(session: Session, user_id: int):
+    """
+    根据每日汇总重建某个用户的排行榜积分和 User.total_score(回填历史数据)
+
+    由调用方提交
+
+    Args:
+        session: 数据库会话
+        user_id: 用户ID
+    """
+    session.execute(delete(LeaderboardEntry).where(LeaderboardEntry.user_id == user_id))
+
+    totals: Dict[tuple, int] = defaultdict(int)
+    statement = select(DailySummary.date, DailySummary.daily_score).where(DailySummary.user_id == user_id)
+    for day, daily_score in session.exec(statement):
+        for period in PERIODS:
+            totals[(period, period_key(period, day))] += daily_score
+
+    now = datetime.now()
+    session.add_all([
+        LeaderboardEntry(period=period, period_key=key, user_id=user_id, points=points, updated_at=now)
+        for (period, key), points in totals.items()
+    ])
+    session.execute(
+        update(User).where(User.id == user_id).values(total_score=totals.get(("all", "all"), 0))
+    )
+
+
+def family_member_ids(session: Session, family_id: int) -> List[int]:
+    """家庭成员的用户ID"""
+    statement = select(FamilyMember.user_id).where(FamilyMember.family_id == family_id)
+    return list(session.exec(statement).all())
+
+
+def top_entries(session: Session, period: str, key: str, limit: int,
+                user_ids: Optional[Sequence[int]] = None) -> List[Dict]:
+    """
+    积分最高的前 limit 名(按 (period, period_key, points) 索引倒序读取)
+
+    Args:
+        session: 数据库会话
+        period: 周期
+        key: 周期键
+        limit: 名次数
+        user_ids: 只在这些用户中排名(家庭榜),为空时为全站榜
+
+    Returns:
+        [{"rank", "user_id", "name", "points"}],同分同名次
+    """
+    statement = (
+        select(LeaderboardEntry.user_id, User.name, LeaderboardEntry.points)
+        .join(User, User.id == LeaderboardEntry.user_id)
+        .where(LeaderboardEntry.period == period, LeaderboardEntry.period_key == key)
+        .order_by(LeaderboardEntry.points.desc(), LeaderboardEntry.user_id)
+        .limit(limit)
+    )
+    if user_ids is not None:
+        statement = statement.where(LeaderboardEntry.user_id.in_(user_ids))
+
+    entries = []
+    for position, (user_id, name, points) in enumerate(session.exec(statement).all(), start=1):
+        rank = entries[-1]["rank"] if entries and entries[-1]["points"] == points else position
+        entries.append({"rank": rank, "user_id": user_id, "name": name, "points": points})
+    return entries
+
+
+def user_rank(session: Session, period: str, key: str, user_id: int,
+              user_ids: Optional[Sequence[int]] = None) -> Optional[Dict]:
+    """
+    用户的名次(积分更高的人数 + 1)
+
+    在 (period, period_key, points) 索引上做范围计数,耗时与名次成正比(O(rank)),
+    不是 O(log n): 数据库索引不维护子树计数。家庭榜只在成员中计数,规模很小;
+    全站榜用户量大到计数变慢时,需要改为按分数分桶计数或内存中的顺序统计树
+
+    Returns:
+        {"rank", "points"},用户在该周期没有积分时返回 None
+    """
+    points = session.exec(
+        select(LeaderboardEntry.points).where(
+            LeaderboardEntry.period == period,
+            LeaderboardEntry.period_key == key,
+            LeaderboardEntry.user_id == user_id
+        )
+    ).first()
+    if points is None:
+        return None
+
+    statement = select(func.count()).select_from(LeaderboardEntry).where(
+        LeaderboardEntry.period == period,
+        LeaderboardEntry.period_key == key,
+        LeaderboardEntry.points > points
+    )
+    if user_ids is not None:
+        statement = statement.where(LeaderboardEntry.user_id.in_(user_ids))
+
+    return {"rank": session.exec(statement).one() + 1, "points": points}
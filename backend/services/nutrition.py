@@ -0,0 +1,375 @@
+"""本地营养估算服务(常见食物直接计算,模型不可用时兜底)"""
+import difflib
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+
+# 中文数字
+CN_DIGITS = {"零": 0, "一": 1, "二": 2, "两": 2, "俩": 2, "三": 3, "四": 4,
+             "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+CN_UNITS = {"十": 10, "百": 100}
+
+# 计量单位统一写法
+UNIT_ALIASES = [
+    ("毫升", "ml"),
+    ("千克", "kg"),
+    ("公斤", "kg"),
+    ("克", "g"),
+]
+
+CN_NUMBER_PATTERN = re.compile(r"^([零一二两俩三四五六七八九十百]+)")
+
+# 规范化之后的份量: 数量 + 单位
+AMOUNT_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)?(.*)$")
+
+
+def _cn_to_int(text: str) -> int:
+    """中文数字转整数(支持到百位)"""
+    total = 0
+    number = 0
+    for ch in text:
+        if ch in CN_DIGITS:
+            number = CN_DIGITS[ch]
+        else:
+            total += (number or 1) * CN_UNITS[ch]
+            number = 0
+    return total + number
+
+
+def normalize_food_name(name: str) -> str:
+    """规范化食物名称: 全角转半角、去空白、小写"""
+    name = unicodedata.normalize("NFKC", name)
+    return re.sub(r"\s+", "", name).lower()
+
+
+def normalize_amount(amount: str) -> str:
+    """
+    规范化份量: "两个" -> "2个", "200 克" -> "200g", "半碗" -> "0.5碗", "二两" -> "2两"
+    """
+    amount = re.sub(r"\s+", "", unicodedata.normalize("NFKC", amount)).lower()
+
+    if amount.startswith("半"):
+        amount = "0.5" + amount[1:]
+    else:
+        match = CN_NUMBER_PATTERN.match(amount)
+        if match:
+            digits = match.group(1)
+            # 数字后面的"两"是重量单位(二两 = 100g)
+            if len(digits) > 1 and digits.endswith("两"):
+                digits = digits[:-1]
+            amount = str(_cn_to_int(digits)) + amount[len(digits):]
+
+    for alias, unit in UNIT_ALIASES:
+        amount = amount.replace(alias, unit)
+
+    return amount
+
+
+# 通用单位的克数(食物没有单独定义时使用)
+UNIT_GRAMS = {
+    "g": 1, "kg": 1000, "ml": 1, "l": 1000, "两": 50, "斤": 500,
+    "碗": 200, "盘": 300, "份": 150, "杯": 250, "瓶": 500, "罐": 330, "盒": 250,
+    "个": 100, "只": 100, "片": 30, "块": 50, "根": 100, "条": 300, "串": 40,
+    "勺": 10, "把": 25, "包": 100, "袋": 100, "口": 15,
+}
+
+# 名称中表示少油烹饪的词(如"清蒸鱼""白灼虾"),按 light 标签计
+LIGHT_COOKING_KEYWORDS = ("清蒸", "白灼", "凉拌", "清炖", "清炒", "白煮", "水煮蛋")
+
+# 没有识别出的食物按一份普通菜估算
+UNKNOWN_FOOD = {"name": "", "kcal": 130, "protein": 5.0, "carbs": 15.0, "fat": 5.0, "tags": (), "serving": 150}
+
+# 常见食物营养成分(每 100g 可食部分)
+# tags: staple 主食 / whole_grain 全谷物 / protein 蛋白质 / vegetable 蔬菜 / fruit 水果 /
+#       fried 油炸 / oily 高油 / sugary 高糖 / processed_meat 加工肉类 /
+#       light 少油烹饪(蒸/煮/凉拌) / drink 饮品 / dessert 甜点
+FOODS: List[Dict] = [
+    # 主食
+    {"name": "米饭", "aliases": ["白米饭", "大米饭", "白饭"], "kcal": 116, "protein": 2.6, "carbs": 25.9, "fat": 0.3,
+     "tags": ("staple",), "serving": 150, "units": {"碗": 150}},
+    {"name": "糙米饭", "aliases": ["杂粮饭", "五谷饭"], "kcal": 111, "protein": 2.6, "carbs": 23.0, "fat": 0.9,
+     "tags": ("staple", "whole_grain"), "serving": 150, "units": {"碗": 150}},
+    {"name": "白粥", "aliases": ["粥", "稀饭", "大米粥"], "kcal": 46, "protein": 1.1, "carbs": 9.9, "fat": 0.3,
+     "tags": ("staple",), "serving": 250, "units": {"碗": 250}},
+    {"name": "小米粥", "aliases": [], "kcal": 46, "protein": 1.4, "carbs": 8.4, "fat": 0.7,
+     "tags": ("staple", "whole_grain"), "serving": 250, "units": {"碗": 250}},
+    {"name": "燕麦粥", "aliases": ["燕麦", "燕麦片"], "kcal": 61, "protein": 2.5, "carbs": 10.5, "fat": 1.2,
+     "tags": ("staple", "whole_grain"), "serving": 250, "units": {"碗": 250}},
+    {"name": "馒头", "aliases": ["白馒头"], "kcal": 223, "protein": 7.0, "carbs": 47.0, "fat": 1.1,
+     "tags": ("staple",), "serving": 100, "units": {"个": 100}},
+    {"name": "包子", "aliases": ["肉包", "肉包子", "菜包"], "kcal": 227, "protein": 7.3, "carbs": 38.0, "fat": 5.0,
+     "tags": ("staple",), "serving": 80, "units": {"个": 80}},
+    {"name": "饺子", "aliases": ["水饺"], "kcal": 240, "protein": 9.0, "carbs": 30.0, "fat": 9.0,
+     "tags": ("staple", "protein"), "serving": 200, "units": {"个": 20, "碗": 250, "盘": 300}},
+    {"name": "面条", "aliases": ["面", "汤面", "拉面", "挂面"], "kcal": 110, "protein": 3.9, "carbs": 24.0, "fat": 0.4,
+     "tags": ("staple",), "serving": 250, "units": {"碗": 300}},
+    {"name": "牛肉面", "aliases": ["兰州拉面"], "kcal": 110, "protein": 6.0, "carbs": 16.0, "fat": 2.5,
+     "tags": ("staple", "protein"), "serving": 500, "units": {"碗": 500}},
+    {"name": "全麦面包", "aliases": [], "kcal": 246, "protein": 8.5, "carbs": 45.0, "fat": 3.5,
+     "tags": ("staple", "whole_grain"), "serving": 70, "units": {"片": 35}},
+    {"name": "面包", "aliases": ["吐司", "白面包"], "kcal": 313, "protein": 8.3, "carbs": 58.0, "fat": 5.1,
+     "tags": ("staple",), "serving": 70, "units": {"片": 35, "个": 80}},
+    {"name": "玉米", "aliases": ["玉米棒", "煮玉米"], "kcal": 112, "protein": 4.0, "carbs": 22.8, "fat": 1.2,
+     "tags": ("staple", "whole_grain"), "serving": 200, "units": {"根": 200}},
+    {"name": "红薯", "aliases": ["地瓜", "番薯", "烤红薯"], "kcal": 99, "protein": 1.1, "carbs": 24.0, "fat": 0.2,
+     "tags": ("staple", "whole_grain"), "serving": 200, "units": {"个": 200}},
+    {"name": "蛋炒饭", "aliases": ["炒饭"], "kcal": 187, "protein": 5.5, "carbs": 26.0, "fat": 6.8,
+     "tags": ("staple", "oily"), "serving": 300, "units": {"碗": 300, "盘": 350}},
+    {"name": "油条", "aliases": [], "kcal": 388, "protein": 6.9, "carbs": 51.0, "fat": 17.6,
+     "tags": ("staple", "fried"), "serving": 60, "units": {"根": 60}},
+    {"name": "方便面", "aliases": ["泡面"], "kcal": 473, "protein": 9.5, "carbs": 61.0, "fat": 21.1,
+     "tags": ("staple", "fried"), "serving": 100, "units": {"包": 100, "碗": 100, "桶": 100}},
+    # 蛋白质
+    {"name": "鸡蛋", "aliases": ["蛋", "煮鸡蛋", "水煮蛋", "白煮蛋", "茶叶蛋"], "kcal": 144, "protein": 13.3, "carbs": 2.8, "fat": 8.8,
+     "tags": ("protein", "light"), "serving": 50, "units": {"个": 50, "只": 50}},
+    {"name": "煎蛋", "aliases": ["荷包蛋", "煎鸡蛋"], "kcal": 199, "protein": 13.0, "carbs": 1.0, "fat": 15.0,
+     "tags": ("protein", "oily"), "serving": 50, "units": {"个": 50, "只": 50}},
+    {"name": "牛奶", "aliases": ["纯牛奶", "鲜牛奶"], "kcal": 54, "protein": 3.0, "carbs": 3.4, "fat": 3.2,
+     "tags": ("protein", "drink"), "serving": 250, "units": {"杯": 250, "盒": 250, "瓶": 250}},
+    {"name": "豆浆", "aliases": ["无糖豆浆"], "kcal": 16, "protein": 1.8, "carbs": 1.1, "fat": 0.7,
+     "tags": ("protein", "drink"), "serving": 250, "units": {"杯": 250}},
+    {"name": "酸奶", "aliases": ["无糖酸奶"], "kcal": 72, "protein": 2.5, "carbs": 9.3, "fat": 2.7,
+     "tags": ("protein", "drink"), "serving": 200, "units": {"杯": 200, "盒": 200, "瓶": 200}},
+    {"name": "鸡胸肉", "aliases": ["鸡胸", "鸡肉"], "kcal": 133, "protein": 19.4, "carbs": 2.5, "fat": 5.0,
+     "tags": ("protein",), "serving": 100, "units": {"块": 100}},
+    {"name": "鸡腿", "aliases": ["卤鸡腿"], "kcal": 181, "protein": 16.0, "carbs": 0.0, "fat": 13.0,
+     "tags": ("protein",), "serving": 150, "units": {"个": 150, "只": 150}},
+    {"name": "炸鸡", "aliases": ["炸鸡腿", "炸鸡块", "鸡米花"], "kcal": 279, "protein": 20.0, "carbs": 10.0, "fat": 17.0,
+     "tags": ("protein", "fried"), "serving": 150, "units": {"块": 60, "个": 150, "只": 150}},
+    {"name": "猪肉", "aliases": ["瘦肉", "猪瘦肉"], "kcal": 143, "protein": 20.3, "carbs": 1.5, "fat": 6.2,
+     "tags": ("protein",), "serving": 100},
+    {"name": "红烧肉", "aliases": ["五花肉", "东坡肉"], "kcal": 400, "protein": 10.0, "carbs": 5.0, "fat": 38.0,
+     "tags": ("protein", "oily"), "serving": 150},
+    {"name": "牛肉", "aliases": ["牛排", "酱牛肉"], "kcal": 125, "protein": 19.9, "carbs": 2.0, "fat": 4.2,
+     "tags": ("protein",), "serving": 100},
+    {"name": "鱼", "aliases": ["鱼肉", "清蒸鱼", "草鱼", "鲈鱼"], "kcal": 113, "protein": 16.6, "carbs": 0.0, "fat": 5.2,
+     "tags": ("protein",), "serving": 150},
+    {"name": "虾", "aliases": ["虾仁", "白灼虾"], "kcal": 93, "protein": 18.6, "carbs": 2.8, "fat": 0.8,
+     "tags": ("protein",), "serving": 100, "units": {"只": 15}},
+    {"name": "豆腐", "aliases": ["麻婆豆腐"], "kcal": 81, "protein": 8.1, "carbs": 4.2, "fat": 3.7,
+     "tags": ("protein",), "serving": 150, "units": {"块": 100}},
+    {"name": "宫保鸡丁", "aliases": [], "kcal": 197, "protein": 15.0, "carbs": 8.0, "fat": 12.0,
+     "tags": ("protein", "oily"), "serving": 200},
+    {"name": "番茄炒蛋", "aliases": ["西红柿炒鸡蛋", "番茄炒鸡蛋", "西红柿炒蛋"], "kcal": 86, "protein": 5.0, "carbs": 4.0, "fat": 6.0,
+     "tags": ("protein", "vegetable"), "serving": 200},
+    {"name": "香肠", "aliases": ["腊肠", "烤肠"], "kcal": 508, "protein": 24.0, "carbs": 11.0, "fat": 40.0,
+     "tags": ("protein", "processed_meat"), "serving": 50, "units": {"根": 50}},
+    {"name": "火腿肠", "aliases": ["火腿"], "kcal": 212, "protein": 14.0, "carbs": 15.6, "fat": 10.4,
+     "tags": ("protein", "processed_meat"), "serving": 50, "units": {"根": 50}},
+    {"name": "培根", "aliases": [], "kcal": 181, "protein": 22.0, "carbs": 2.6, "fat": 9.0,
+     "tags": ("protein", "processed_meat"), "serving": 50, "units": {"片": 15}},
+    # 蔬菜
+    {"name": "青菜", "aliases": ["小白菜", "上海青", "油菜", "炒青菜", "白菜", "菠菜", "生菜", "空心菜"],
+     "kcal": 15, "protein": 1.5, "carbs": 2.7, "fat": 0.3, "tags": ("vegetable",), "serving": 200},
+    {"name": "西兰花", "aliases": ["西蓝花", "花菜", "菜花"], "kcal": 36, "protein": 4.1, "carbs": 4.3, "fat": 0.6,
+     "tags": ("vegetable",), "serving": 200},
+    {"name": "番茄", "aliases": ["西红柿"], "kcal": 20, "protein": 0.9, "carbs": 4.0, "fat": 0.2,
+     "tags": ("vegetable",), "serving": 150, "units": {"个": 150}},
+    {"name": "黄瓜", "aliases": ["拍黄瓜"], "kcal": 16, "protein": 0.8, "carbs": 2.9, "fat": 0.2,
+     "tags": ("vegetable",), "serving": 200, "units": {"根": 200}},
+    {"name": "胡萝卜", "aliases": [], "kcal": 39, "protein": 1.0, "carbs": 8.8, "fat": 0.2,
+     "tags": ("vegetable",), "serving": 120, "units": {"根": 120}},
+    {"name": "土豆丝", "aliases": ["炒土豆丝", "土豆"], "kcal": 110, "protein": 2.0, "carbs": 17.0, "fat": 4.0,
+     "tags": ("vegetable",), "serving": 200},
+    {"name": "蔬菜沙拉", "aliases": ["沙拉", "凉拌菜"], "kcal": 40, "protein": 1.5, "carbs": 5.0, "fat": 1.5,
+     "tags": ("vegetable", "light"), "serving": 200},
+    # 水果
+    {"name": "苹果", "aliases": [], "kcal": 53, "protein": 0.2, "carbs": 13.7, "fat": 0.2,
+     "tags": ("fruit",), "serving": 200, "units": {"个": 200}},
+    {"name": "香蕉", "aliases": [], "kcal": 93, "protein": 1.4, "carbs": 22.0, "fat": 0.2,
+     "tags": ("fruit",), "serving": 120, "units": {"根": 120, "个": 120}},
+    {"name": "橙子", "aliases": ["橘子", "桔子"], "kcal": 48, "protein": 0.8, "carbs": 11.1, "fat": 0.2,
+     "tags": ("fruit",), "serving": 200, "units": {"个": 200}},
+    {"name": "坚果", "aliases": ["核桃", "杏仁", "花生"], "kcal": 600, "protein": 18.0, "carbs": 20.0, "fat": 50.0,
+     "tags": ("protein",), "serving": 25},
+    # 饮料和零食
+    {"name": "可乐", "aliases": ["可口可乐", "百事可乐", "雪碧", "汽水"], "kcal": 43, "protein": 0.0, "carbs": 10.8, "fat": 0.0,
+     "tags": ("sugary", "drink"), "serving": 330},
+    {"name": "无糖可乐", "aliases": ["零度可乐", "健怡可乐"], "kcal": 0, "protein": 0.0, "carbs": 0.0, "fat": 0.0,
+     "tags": ("drink",), "serving": 330},
+    {"name": "奶茶", "aliases": ["珍珠奶茶"], "kcal": 70, "protein": 1.0, "carbs": 12.0, "fat": 2.0,
+     "tags": ("sugary", "drink"), "serving": 500, "units": {"杯": 500}},
+    {"name": "果汁", "aliases": ["橙汁", "苹果汁"], "kcal": 45, "protein": 0.3, "carbs": 10.5, "fat": 0.1,
+     "tags": ("sugary", "drink"), "serving": 250},
+    {"name": "蛋糕", "aliases": ["奶油蛋糕"], "kcal": 348, "protein": 8.6, "carbs": 67.0, "fat": 5.1,
+     "tags": ("sugary", "dessert"), "serving": 80, "units": {"块": 80}},
+    {"name": "冰淇淋", "aliases": ["雪糕", "冰激凌"], "kcal": 127, "protein": 2.4, "carbs": 17.3, "fat": 5.3,
+     "tags": ("sugary", "dessert"), "serving": 80, "units": {"个": 80, "支": 80}},
+    {"name": "薯条", "aliases": [], "kcal": 298, "protein": 4.3, "carbs": 40.0, "fat": 15.0,
+     "tags": ("fried",), "serving": 100, "units": {"份": 100, "包": 100}},
+    {"name": "汉堡", "aliases": ["汉堡包"], "kcal": 250, "protein": 12.0, "carbs": 28.0, "fat": 10.0,
+     "tags": ("staple", "protein", "oily"), "serving": 200, "units": {"个": 200}},
+]
+
+
+def _build_index() -> Dict[str, Dict]:
+    """名称和别名 -> 食物条目"""
+    index = {}
+    for food in FOODS:
+        for name in [food["name"], *food["aliases"]]:
+            index.setdefault(normalize_food_name(name), food)
+    return index
+
+
+FOOD_INDEX = _build_index()
+
+# 按长度倒序,包含匹配时优先匹配更长(更具体)的名称
+FOOD_NAMES_BY_LENGTH = sorted(FOOD_INDEX, key=len, reverse=True)
+
+
+@lru_cache(maxsize=4096)
+def lookup_food(name: str) -> Tuple[Optional[Dict], bool]:
+    """
+    查找食物
+
+    依次尝试: 名称/别名精确匹配 -> 包含已知名称(如"清炒西兰花") -> 近似匹配(错别字)
+
+    Returns:
+        (食物条目, 是否精确匹配),找不到时返回 (None, False)
+    """
+    key = normalize_food_name(name)
+    if key in FOOD_INDEX:
+        return FOOD_INDEX[key], True
+
+    for known in FOOD_NAMES_BY_LENGTH:
+        if len(known) > 1 and known in key:
+            return FOOD_INDEX[known], False
+
+    matches = difflib.get_close_matches(key, FOOD_INDEX.keys(), n=1, cutoff=0.6)
+    if matches:
+        return FOOD_INDEX[matches[0]], False
+    return None, False
+
+
+def parse_amount_grams(amount: str, food: Dict) -> Optional[float]:
+    """
+    份量换算为克数: "一碗" / "200g" / "2个" / "半份"
+
+    只有数量没有单位时按份数计算,单位无法识别时返回 None
+    """
+    match = AMOUNT_PATTERN.match(normalize_amount(amount))
+    quantity = float(match.group(1)) if match.group(1) else 1.0
+    unit = match.group(2)
+
+    if not unit or (unit == "份" and "份" not in food.get("units", {})):
+        return quantity * food["serving"]
+
+    # 单位后可能带描述,如"1碗(大)"
+    for candidate in (unit, unit[:1]):
+        if candidate in food.get("units", {}):
+            return quantity * food["units"][candidate]
+        if candidate in UNIT_GRAMS:
+            return quantity * UNIT_GRAMS[candidate]
+    return None
+
+
+def estimate_meal(food_items: List[Dict], allow_unknown: bool = False) -> Optional[Dict]:
+    """
+    按食物成分表估算一餐,评分规则与 DIET_ANALYSIS_PROMPT 的评分标准一致
+
+    Args:
+        food_items: 食物列表,格式: [{"name": "食物名", "amount": "份量"}, ...]
+        allow_unknown: 是否允许无法识别的食物(按一份普通菜估算);
+            为 False 时,只要有一项不是精确匹配或份量无法换算就返回 None
+
+    Returns:
+        与模型分析结果相同格式的字典,无法估算时返回 None
+    """
+    if not food_items:
+        return None
+
+    totals = {"kcal": 0.0, "protein": 0.0, "carbs": 0.0, "fat": 0.0}
+    grams_by_tag: Dict[str, float] = {}
+    unknown = 0
+
+    for item in food_items:
+        food, exact = lookup_food(item["name"])
+        grams = parse_amount_grams(item["amount"], food) if food else None
+
+        if food is None or grams is None or not exact:
+            if not allow_unknown:
+                return None
+            if food is None:
+                unknown += 1
+                food = UNKNOWN_FOOD
+            if grams is None:
+                grams = food["serving"]
+
+        for field in totals:
+            totals[field] += food[field] * grams / 100
+        tags = set(food["tags"])
+        if any(keyword in item["name"] for keyword in LIGHT_COOKING_KEYWORDS):
+            tags.add("light")
+        for tag in tags:
+            grams_by_tag[tag] = grams_by_tag.get(tag, 0) + grams
+
+    return _score_meal(totals, grams_by_tag, unknown)
+
+
+def _score_meal(totals: Dict[str, float], grams_by_tag: Dict[str, float], unknown: int) -> Dict:
+    has = lambda tag: grams_by_tag.get(tag, 0) > 0
+    fat_ratio = totals["fat"] * 9 / totals["kcal"] if totals["kcal"] else 0
+
+    # 营养均衡: 基础分 60
+    balanced = has("staple") and has("protein") and has("vegetable")
+    score = 60 if balanced else 50
+    advice = []
+
+    if grams_by_tag.get("vegetable", 0) >= 200:
+        score += 10
+    elif not has("vegetable"):
+        advice.append("增加蔬菜")
+    if totals["protein"] >= 25:
+        score += 5
+    elif totals["protein"] < 10:
+        advice.append("补充蛋白质")
+    # 少油/无糖加分只在有可判断的菜品时给: 有少油烹饪的菜,或有饮品/甜点
+    if has("light") and not has("fried") and not has("oily") and fat_ratio <= 0.3:
+        score += 10
+    if (has("drink") or has("dessert")) and not has("sugary"):
+        score += 10
+    if has("whole_grain"):
+        score += 5
+    if has("fried"):
+        score -= 15
+        advice.append("少吃油炸食品")
+    if has("sugary"):
+        score -= 10
+        advice.append("少喝含糖饮料、少吃甜食")
+    if grams_by_tag.get("processed_meat", 0) >= 50:
+        score -= 10
+        advice.append("减少加工肉类")
+
+    score = max(0, min(100, score))
+
+    if advice:
+        analysis = "建议" + "、".join(advice) + "。"
+    elif balanced:
+        analysis = "搭配均衡,继续保持。"
+    else:
+        analysis = "整体尚可,注意主食、蛋白质和蔬菜的搭配。"
+    if unknown:
+        analysis = f"{unknown} 项食物未能识别,热量为估算值。" + analysis
+
+    return {
+        "health_score": score,
+        "total_calories": int(round(totals["kcal"])),
+        "analysis": analysis,
+        "nutrition_balance": {
+            "protein": _level(totals["protein"], 25, 10, ("充足", "适中", "不足")),
+            "carbs": _level(totals["carbs"], 75, 30, ("充足", "适中", "不足")),
+            "vegetables": _level(grams_by_tag.get("vegetable", 0), 200, 80, ("充足", "适中", "不足")),
+            "oil": "过多" if has("fried") or fat_ratio > 0.35 else ("适中" if fat_ratio >= 0.15 else "较少"),
+            "sugar": "过多" if has("sugary") else "较少"
+        }
+    }
+
+
+def _level(value: float, high: float, low: float, labels: Tuple[str, str, str]) -> str:
+    if value >= high:
+        return labels[0]
+    if value >= low:
+        return labels[1]
+    return labels[2]
@@ -0,0 +1,239 @@
+"""本地截图识别服务(华为/苹果固定版式的 OCR 快速通道)"""
+import re
+from datetime import date
+from io import BytesIO
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+from PIL import Image, ImageOps
+from config import settings
+
+
+# 一行 OCR 文字及其平均置信度(0-1)
+OcrLine = Tuple[str, float]
+
+# 版式关键字
+LAYOUT_KEYWORDS = {
+    "huawei": ("华为运动健康", "运动健康", "HUAWEI", "华为"),
+    "apple": ("Apple Watch", "体能训练", "健身记录", "Fitness", "活动记录"),
+}
+
+# 常见运动类型(较长的名称在前,避免"户外跑步"被识别为"跑步")
+EXERCISE_TYPES = (
+    "户外跑步", "室内跑步", "户外步行", "室内步行", "户外骑行", "室内骑行", "泳池游泳", "开放水域",
+    "跑步", "步行", "健走", "徒步", "登山", "骑行", "游泳", "网球", "羽毛球", "乒乓球", "篮球",
+    "足球", "瑜伽", "跳绳", "椭圆机", "划船机", "力量训练", "高强度间歇训练",
+)
+
+NUMBER = r"(\d{1,3}(?:[,，]\d{3})+|\d+)"
+DURATION_PATTERN = re.compile(r"(?:运动时长|时长|用时|锻炼时间)\D{0,4}(\d{1,2}):(\d{2})(?::(\d{2}))?")
+BARE_DURATION_PATTERN = re.compile(r"(?<![\d:-])(\d{1,2}):(\d{2}):(\d{2})(?![\d:])")
+CALORIES_PATTERN = re.compile(NUMBER + r"\s*(?:千卡|大卡|kcal|KCAL|卡路里)")
+STEPS_PATTERN = re.compile(NUMBER + r"\s*步(?!数)")
+AVG_HEART_RATE_PATTERN = re.compile(r"平均心率\D{0,6}(\d{2,3})")
+MAX_HEART_RATE_PATTERN = re.compile(r"最[大高]心率\D{0,6}(\d{2,3})")
+DATE_PATTERN = re.compile(r"(?<![\d:])(?:(\d{4})[年/.-])?(\d{1,2})[月/.-](\d{1,2})(?![\d:])日?")
+DAY_RANGE_PATTERN = re.compile(r"00:00\s*[-~至]\s*23:59")
+# 与中文相邻的空格(chi_sim 常把中文逐字切分为单词)
+CJK_SPACE_PATTERN = re.compile(r"\s+(?=[\u4e00-\u9fff])|(?<=[\u4e00-\u9fff])\s+")
+
+
+def _to_int(text: str) -> int:
+    return int(re.sub(r"[,，]", "", text))
+
+
+def join_words(words: List[str]) -> str:
+    """合并一行中的单词: 英文和数字之间保留空格,中文前后的空格去掉"""
+    return CJK_SPACE_PATTERN.sub("", " ".join(words))
+
+
+def _compact(text: str) -> str:
+    return re.sub(r"\s+", "", text).lower()
+
+
+def detect_layout(text: str) -> str:
+    """根据关键字判断截图来源(忽略空白和大小写),无法判断时返回 unknown"""
+    text = _compact(text)
+    for device, keywords in LAYOUT_KEYWORDS.items():
+        if any(_compact(keyword) in text for keyword in keywords):
+            return device
+    return "unknown"
+
+
+def extract_exercise_fields(lines: List[OcrLine]) -> Tuple[Dict, float]:
+    """
+    按固定版式从 OCR 文字中提取运动数据
+
+    Args:
+        lines: [(一行文字, 置信度)],按从上到下排列
+
+    Returns:
+        (与模型输出格式相同的数据, 置信度 0-1)
+        置信度取必填字段所在行的最低 OCR 置信度,未检测到已知版式时打折
+    """
+    text = "\n".join(line for line, _ in lines)
+    source_device = detect_layout(text)
+    field_confidences: List[float] = []
+
+    def search(pattern: re.Pattern) -> Optional[Tuple[re.Match, float]]:
+        for line, confidence in lines:
+            match = pattern.search(line)
+            if match:
+                return match, confidence
+        return None
+
+    data: Dict = {
+        "exercise_type": None,
+        "duration_min": None,
+        "calories": None,
+        "steps": None,
+        "avg_heart_rate": None,
+        "max_heart_rate": None,
+        "date": None,
+        "source_device": source_device,
+    }
+
+    # 运动类型: 全天步数总结,或截图上方出现的第一个已知运动名称
+    is_daily_steps = DAY_RANGE_PATTERN.search(text) is not None and "步数" in text
+    if is_daily_steps:
+        data["exercise_type"] = "每日步数"
+        data["duration_min"] = 0
+    else:
+        for line, confidence in lines:
+            exercise_type = next((name for name in EXERCISE_TYPES if name in line), None)
+            if exercise_type:
+                data["exercise_type"] = exercise_type
+                field_confidences.append(confidence)
+                break
+
+        found = search(DURATION_PATTERN) or search(BARE_DURATION_PATTERN)
+        if found:
+            match, confidence = found
+            first, second, third = match.group(1), match.group(2), match.group(3)
+            # HH:MM:SS 或 MM:SS
+            if third is not None:
+                minutes = int(first) * 60 + int(second) + (1 if int(third) >= 30 else 0)
+            else:
+                minutes = int(first) + (1 if int(second) >= 30 else 0)
+            data["duration_min"] = minutes
+            field_confidences.append(confidence)
+
+    found = search(CALORIES_PATTERN)
+    if found:
+        data["calories"] = _to_int(found[0].group(1))
+        field_confidences.append(found[1])
+
+    found = search(STEPS_PATTERN)
+    if found:
+        data["steps"] = _to_int(found[0].group(1))
+        if is_daily_steps:
+            field_confidences.append(found[1])
+
+    found = search(AVG_HEART_RATE_PATTERN)
+    if found:
+        data["avg_heart_rate"] = int(found[0].group(1))
+
+    found = search(MAX_HEART_RATE_PATTERN)
+    if found:
+        data["max_heart_rate"] = int(found[0].group(1))
+
+    found = search(DATE_PATTERN)
+    if found:
+        year, month, day = found[0].groups()
+        try:
+            data["date"] = date(int(year) if year else date.today().year, int(month), int(day)).isoformat()
+        except ValueError:
+            pass
+
+    # 必填字段: 单次运动为类型/时长/卡路里,步数总结为步数/卡路里
+    required = 2 if is_daily_steps else 3
+    if len(field_confidences) < required:
+        return data, 0.0
+
+    confidence = min(field_confidences)
+    if source_device == "unknown":
+        confidence *= 0.8
+    return data, confidence
+
+
+class LocalRecognizer:
+    """本地识别器接口"""
+
+    name = ""
+
+    def available(self) -> bool:
+        raise NotImplementedError
+
+    def recognize(self, image: Union[bytes, BinaryIO]) -> Tuple[Dict, float]:
+        """
+        识别截图
+
+        Returns:
+            (与模型输出格式相同的数据, 置信度 0-1)
+        """
+        raise NotImplementedError
+
+
+class TesseractRecognizer(LocalRecognizer):
+    """基于 Tesseract 的 OCR(需要安装 pytesseract 和 tesseract-ocr 中文语言包)"""
+
+    name = "tesseract"
+
+    def __init__(self):
+        self._available: Optional[bool] = None
+
+    def available(self) -> bool:
+        if self._available is None:
+            try:
+                import pytesseract
+                pytesseract.get_tesseract_version()
+                self._available = True
+            except Exception:
+                print("⚠️ 未安装 pytesseract/tesseract,跳过本地截图识别")
+                self._available = False
+        return self._available
+
+    def _read_lines(self, image: Image.Image) -> List[OcrLine]:
+        import pytesseract
+
+        data = pytesseract.image_to_data(
+            image,
+            lang=settings.VISION_OCR_LANG,
+            output_type=pytesseract.Output.DICT
+        )
+        # 按 (块, 段落, 行) 合并单词
+        lines: Dict[Tuple[int, int, int], List[Tuple[str, float]]] = {}
+        for i, word in enumerate(data["text"]):
+            word = word.strip()
+            confidence = float(data["conf"][i])
+            if not word or confidence < 0:
+                continue
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            lines.setdefault(key, []).append((word, confidence))
+
+        return [
+            (join_words([word for word, _ in words]), sum(c for _, c in words) / len(words) / 100)
+            for _, words in sorted(lines.items())
+        ]
+
+    def recognize(self, image: Union[bytes, BinaryIO]) -> Tuple[Dict, float]:
+        stream = BytesIO(image) if isinstance(image, bytes) else image
+        stream.seek(0)
+        with Image.open(stream) as source:
+            gray = ImageOps.grayscale(ImageOps.exif_transpose(source))
+            # 深色主题截图反色,Tesseract 对白底黑字识别更准
+            if sum(gray.resize((1, 1)).getdata()) < 128:
+                gray = ImageOps.invert(gray)
+            lines = self._read_lines(gray)
+        stream.seek(0)
+        return extract_exercise_fields(lines)
+
+
+# 可用的本地识别器
+RECOGNIZERS = {
+    TesseractRecognizer.name: TesseractRecognizer,
+}
+
+
+def create_recognizers() -> List[LocalRecognizer]:
+    """按配置(VISION_LOCAL_RECOGNIZERS,逗号分隔)创建本地识别器"""
+    names = [name.strip() for name in settings.VISION_LOCAL_RECOGNIZERS.split(",") if name.strip()]
+    return [RECOGNIZERS[name]() for name in names if name in RECOGNIZERS]
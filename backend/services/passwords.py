@@ -0,0 +1,106 @@
+"""密码哈希服务"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import re
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from config import settings
+
+
+# 旧版本的无盐 SHA-256 哈希(64 位十六进制)
+LEGACY_SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+# 密码哈希专用线程池: 登录高峰只占用这几个线程,不会挤占其他接口的线程池
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    # maxmem 需要覆盖 128 * n * r * p 字节的工作内存
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p, dklen=32)
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+
+
+def hash_password(password: str) -> str:
+    """
+    加盐哈希密码
+
+    Returns:
+        scrypt$n$r$p$salt$hash 或 pbkdf2_sha256$iterations$salt$hash
+    """
+    salt = secrets.token_bytes(16)
+
+    if settings.PASSWORD_HASH_ALGORITHM == "pbkdf2_sha256":
+        iterations = settings.PASSWORD_PBKDF2_ITERATIONS
+        digest = _pbkdf2(password, salt, iterations)
+        return f"pbkdf2_sha256${iterations}${_b64encode(salt)}${_b64encode(digest)}"
+
+    n, r, p = settings.PASSWORD_SCRYPT_N, settings.PASSWORD_SCRYPT_R, settings.PASSWORD_SCRYPT_P
+    digest = _scrypt(password, salt, n, r, p)
+    return f"scrypt${n}${r}${p}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    """校验密码,兼容旧版 SHA-256 哈希"""
+    if LEGACY_SHA256_PATTERN.match(password_hash):
+        expected = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(expected, password_hash)
+
+    parts = password_hash.split("$")
+    try:
+        if parts[0] == "scrypt" and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            digest = _scrypt(password, _b64decode(parts[4]), n, r, p)
+            return hmac.compare_digest(digest, _b64decode(parts[5]))
+
+        if parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+            digest = _pbkdf2(password, _b64decode(parts[2]), int(parts[1]))
+            return hmac.compare_digest(digest, _b64decode(parts[3]))
+    except ValueError:
+        return False
+
+    return False
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """哈希是否为旧格式或与当前配置的算法/参数不一致"""
+    parts = password_hash.split("$")
+
+    if settings.PASSWORD_HASH_ALGORITHM == "pbkdf2_sha256":
+        return not (parts[0] == "pbkdf2_sha256" and len(parts) == 4
+                    and parts[1] == str(settings.PASSWORD_PBKDF2_ITERATIONS))
+
+    return not (parts[0] == "scrypt" and len(parts) == 6 and parts[1:4] == [
+        str(settings.PASSWORD_SCRYPT_N), str(settings.PASSWORD_SCRYPT_R), str(settings.PASSWORD_SCRYPT_P)
+    ])
+
+
+# 用户不存在时也执行一次同等开销的校验,避免通过响应时间判断用户名是否存在
+DUMMY_PASSWORD_HASH = hash_password(secrets.token_urlsafe(16))
+
+
+async def hash_password_async(password: str) -> str:
+    """在密码哈希线程池中计算哈希"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, hash_password, password)
+
+
+async def verify_password_async(password: str, password_hash: str) -> bool:
+    """在密码哈希线程池中校验密码"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, verify_password, password, password_hash)
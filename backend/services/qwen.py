@@ -0,0 +1,182 @@
+"""千问 API 共享 HTTP 客户端"""
+import importlib.util
+import json
+import httpx
+from typing import AsyncIterator, Dict, Optional
+from config import settings
+from services.ratelimit import estimate_tokens, limiter_for_model
+from services.resilience import is_transient, policy_for_model
+
+
+# 进程级共享客户端(由 main.lifespan 创建和关闭)
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    """创建带连接池的 AsyncClient"""
+    limits = httpx.Limits(
+        max_connections=settings.QWEN_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.QWEN_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.QWEN_KEEPALIVE_EXPIRY
+    )
+    timeout = httpx.Timeout(settings.API_TIMEOUT, connect=settings.QWEN_CONNECT_TIMEOUT)
+
+    # HTTP/2 依赖 h2 包,未安装时退回 HTTP/1.1 keep-alive
+    http2 = settings.QWEN_HTTP2 and importlib.util.find_spec("h2") is not None
+
+    return httpx.AsyncClient(
+        base_url=settings.QWEN_API_URL,
+        headers={
+            "Authorization": f"Bearer {settings.QWEN_API_KEY}",
+            "Content-Type": "application/json"
+        },
+        http2=http2,
+        limits=limits,
+        timeout=timeout
+    )
+
+
+async def init_client() -> httpx.AsyncClient:
+    """初始化共享客户端"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def close_client():
+    """关闭共享客户端,释放连接池"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    获取共享客户端
+
+    未经 lifespan 初始化(如脚本中直接调用服务)时按需创建
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def _send_rate_limited(payload: Dict, timeout: float, user_id: Optional[int]) -> httpx.Response:
+    """按模型排队限流后发送一次请求,收到 429 时按 Retry-After 退避后重试"""
+    client = get_client()
+    limiter = limiter_for_model(payload["model"])
+    estimated_tokens = estimate_tokens(payload)
+
+    attempt = 0
+    while True:
+        async with limiter.slot(estimated_tokens, user_id):
+            response = await client.post(
+                "/chat/completions",
+                json=payload,
+                timeout=httpx.Timeout(timeout, connect=settings.QWEN_CONNECT_TIMEOUT)
+            )
+        limiter.record_usage(estimated_tokens, response)
+
+        if response.status_code != 429 or attempt >= settings.QWEN_RATE_LIMIT_RETRIES:
+            return response
+
+        # 退避期间所有请求暂停发送,重新排队时等待到恢复
+        delay = limiter.backoff(response, attempt)
+        print(f"⚠️ 千问 API 限流(429),{delay:.1f} 秒后重试")
+        attempt += 1
+
+
+async def post_chat_completion(payload: Dict, timeout: float, user_id: Optional[int] = None) -> httpx.Response:
+    """
+    调用 chat/completions 接口
+
+    限流排队 + 429 退避,外层再做网络错误/5xx 重试、对冲请求和熔断
+
+    Args:
+        payload: 请求体
+        timeout: 本次调用的读取超时(秒)
+        user_id: 发起调用的用户ID(用于单用户并发限制)
+
+    Returns:
+        HTTP 响应(重试次数用完后可能仍为 429/5xx)
+
+    Raises:
+        CircuitOpenError: 熔断中
+        httpx.HTTPError: 网络错误或读取超时
+    """
+    policy = policy_for_model(payload["model"])
+    return await policy.call(lambda: _send_rate_limited(payload, timeout, user_id))
+
+
+async def stream_chat_completion(payload: Dict, timeout: float,
+                                 user_id: Optional[int] = None) -> AsyncIterator[str]:
+    """
+    以流式模式调用 chat/completions 接口,逐段返回模型输出的文本
+
+    与 post_chat_completion 共用限流和熔断;开始输出后不重试(已返回给调用方的内容无法撤回)。
+    调用方提前停止迭代(aclose)时立即断开连接,模型不再继续生成
+
+    Args:
+        payload: 请求体(自动加上 stream)
+        timeout: 两段输出之间的最长等待时间(秒)
+        user_id: 发起调用的用户ID(用于单用户并发限制)
+
+    Yields:
+        模型新输出的文本片段
+
+    Raises:
+        CircuitOpenError: 熔断中
+        httpx.HTTPError: 网络错误或读取超时
+        Exception: API 返回非 200 状态码
+    """
+    client = get_client()
+    limiter = limiter_for_model(payload["model"])
+    policy = policy_for_model(payload["model"])
+    estimated_tokens = estimate_tokens(payload)
+    payload = {**payload, "stream": True}
+
+    policy.breaker.allow()
+
+    attempt = 0
+    while True:
+        async with limiter.slot(estimated_tokens, user_id):
+            try:
+                async with client.stream(
+                    "POST",
+                    "/chat/completions",
+                    json=payload,
+                    timeout=httpx.Timeout(timeout, connect=settings.QWEN_CONNECT_TIMEOUT)
+                ) as response:
+                    if response.status_code == 200:
+                        policy.breaker.record_success()
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[5:].strip()
+                            if data == "[DONE]":
+                                return
+                            try:
+                                delta = json.loads(data)["choices"][0]["delta"].get("content")
+                            except (ValueError, KeyError, IndexError, TypeError):
+                                continue
+                            if delta:
+                                yield delta
+                        return
+                    await response.aread()
+            except httpx.TransportError:
+                policy.breaker.record_failure()
+                raise
+
+        if response.status_code != 429 or attempt >= settings.QWEN_RATE_LIMIT_RETRIES:
+            if is_transient(response):
+                policy.breaker.record_failure()
+            else:
+                policy.breaker.record_success()
+            raise Exception(f"API 调用失败: {response.status_code}")
+
+        delay = limiter.backoff(response, attempt)
+        print(f"⚠️ 千问 API 限流(429),{delay:.1f} 秒后重试")
+        attempt += 1
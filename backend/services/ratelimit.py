@@ -0,0 +1,256 @@
+"""千问 API 限流服务(令牌桶 + 并发信号量)"""
+import asyncio
+import random
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Optional
+import httpx
+from config import settings
+
+
+class TokenBucket:
+    """
+    令牌桶(按分钟配额匀速补充)
+
+    等待方按先来后到排队,配额不足时睡眠到足够为止
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float):
+        # 单次请求超过桶容量时按容量计,避免永远等不到
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, delta: float):
+        """按实际用量修正(预估多了退回,少了记为欠额)"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+
+class RateLimiter:
+    """
+    单个模型的限流器
+
+    - 全局并发信号量 + 每个用户的并发信号量
+    - RPM / TPM 令牌桶(配置为 0 时不限制)
+    - 收到 429 后暂停发送,按 Retry-After 或指数退避恢复
+    """
+
+    def __init__(self, name: str, rpm: int, tpm: int, max_concurrency: int, per_user_concurrency: int):
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.max_concurrency = max_concurrency
+        self.per_user_concurrency = per_user_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._user_semaphores: Dict[int, list] = {}
+        self._resume_at = 0.0
+
+        # 统计
+        self.total = 0
+        self.throttled = 0
+        self.waiting = 0
+        self.in_flight = 0
+        self.wait_seconds = 0.0
+
+    def _user_semaphore(self, user_id: int) -> asyncio.Semaphore:
+        entry = self._user_semaphores.get(user_id)
+        if entry is None:
+            entry = self._user_semaphores[user_id] = [asyncio.Semaphore(self.per_user_concurrency), 0]
+        entry[1] += 1
+        return entry[0]
+
+    def _release_user(self, user_id: int):
+        entry = self._user_semaphores[user_id]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._user_semaphores[user_id]
+
+    async def _wait_for_quota(self, estimated_tokens: int):
+        # 429 退避期间不发送新请求
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.requests is not None:
+            await self.requests.acquire(1)
+        if self.tokens is not None:
+            await self.tokens.acquire(estimated_tokens)
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int, user_id: Optional[int] = None) -> AsyncIterator["RateLimiter"]:
+        """
+        排队获取一次调用的配额
+
+        Args:
+            estimated_tokens: 预估的 token 数(请求 + 最大输出)
+            user_id: 用户ID,为空时只受全局限制
+        """
+        start = time.monotonic()
+        queued = True
+        self.waiting += 1
+        try:
+            async with AsyncExitStack() as stack:
+                if user_id is not None:
+                    user_semaphore = self._user_semaphore(user_id)
+                    stack.callback(self._release_user, user_id)
+                    await stack.enter_async_context(user_semaphore)
+                await stack.enter_async_context(self._semaphore)
+                await self._wait_for_quota(estimated_tokens)
+
+                queued = False
+                self.waiting -= 1
+                self.wait_seconds += time.monotonic() - start
+                self.total += 1
+                self.in_flight += 1
+                try:
+                    yield self
+                finally:
+                    self.in_flight -= 1
+        finally:
+            if queued:
+                self.waiting -= 1
+
+    def record_usage(self, estimated_tokens: int, response: httpx.Response):
+        """根据响应中的 usage 修正 TPM 配额"""
+        if self.tokens is None or response.status_code != 200:
+            return
+        try:
+            actual = response.json()["usage"]["total_tokens"]
+        except (ValueError, KeyError, TypeError):
+            return
+        self.tokens.adjust(estimated_tokens - actual)
+
+    def backoff(self, response: httpx.Response, attempt: int) -> float:
+        """
+        收到 429 后暂停发送
+
+        Returns:
+            暂停秒数
+        """
+        self.throttled += 1
+        delay = retry_after_seconds(response)
+        if delay is None:
+            delay = settings.QWEN_RATE_LIMIT_BACKOFF * (2 ** attempt)
+        # 加随机抖动,避免所有等待方同时恢复
+        delay += random.uniform(0, delay * 0.25)
+        self._resume_at = max(self._resume_at, time.monotonic() + delay)
+        return delay
+
+    def stats(self) -> Dict:
+        return {
+            "requests": self.total,
+            "throttled": self.throttled,
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "avg_wait_ms": round(self.wait_seconds / self.total * 1000, 1) if self.total else 0.0,
+            "rpm_available": int(self.requests.tokens) if self.requests else None,
+            "tpm_available": int(self.tokens.tokens) if self.tokens else None,
+            "paused_seconds": round(max(self._resume_at - time.monotonic(), 0), 1)
+        }
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """解析 Retry-After 响应头(秒数或 HTTP 日期)"""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def estimate_tokens(payload: Dict) -> int:
+    """
+    预估一次调用的 token 数
+
+    文本按字符数计(中文约一字一 token,偏保守),图片按预处理后的最大尺寸估算
+    """
+    tokens = payload.get("max_tokens", 0)
+    for message in payload.get("messages", []):
+        content = message.get("content", "")
+        if isinstance(content, str):
+            tokens += len(content)
+            continue
+        for part in content:
+            if part.get("type") == "text":
+                tokens += len(part["text"])
+            elif part.get("type") == "image_url":
+                # 千问 VL 每 28x28 像素约一个 token
+                tokens += (settings.VISION_IMAGE_MAX_DIM // 28) ** 2
+    return tokens
+
+
+def worker_count() -> int:
+    """本部署的 worker 进程数(与 main.py 启动 uvicorn 时一致)"""
+    return 1 if settings.RELOAD else max(settings.WEB_CONCURRENCY, 1)
+
+
+def per_worker(limit: int, floor: int = 1) -> int:
+    """
+    把整个部署的配额分摊到每个 worker 进程(令牌桶和信号量都在进程内)
+
+    Args:
+        limit: 整个部署的配额,0 表示不限制
+        floor: 每个进程的下限(不超过 limit)
+
+    Returns:
+        本进程的配额
+    """
+    if limit <= 0:
+        return limit
+    return max(limit // worker_count(), min(floor, limit))
+
+
+# 并发数下限为单用户并发上限: 按 worker 数分摊后仍能让一个用户的批量请求并行,
+# 整个部署的实际并发可能超过 *_MAX_CONCURRENCY,服务商配额由 RPM/TPM 控制
+vision_limiter = RateLimiter(
+    "vision",
+    rpm=per_worker(settings.VISION_RPM),
+    tpm=per_worker(settings.VISION_TPM),
+    max_concurrency=per_worker(settings.VISION_MAX_CONCURRENCY, floor=settings.QWEN_PER_USER_CONCURRENCY),
+    per_user_concurrency=settings.QWEN_PER_USER_CONCURRENCY
+)
+
+diet_limiter = RateLimiter(
+    "diet",
+    rpm=per_worker(settings.DIET_RPM),
+    tpm=per_worker(settings.DIET_TPM),
+    max_concurrency=per_worker(settings.DIET_MAX_CONCURRENCY, floor=settings.QWEN_PER_USER_CONCURRENCY),
+    per_user_concurrency=settings.QWEN_PER_USER_CONCURRENCY
+)
+
+
+def limiter_for_model(model: str) -> RateLimiter:
+    """按模型选择限流器(千问的配额按模型分别计算)"""
+    return vision_limiter if model == settings.VISION_MODEL else diet_limiter
+
+
+def rate_limit_stats() -> Dict[str, Dict]:
+    """所有限流器的统计"""
+    return {limiter.name: limiter.stats() for limiter in (vision_limiter, diet_limiter)}
@@ -0,0 +1,236 @@
+"""千问 API 容错服务(重试、对冲请求、熔断)"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+import httpx
+from config import settings
+
+
+# 可以重试的网络错误(连接阶段失败,请求没有到达模型)
+RETRYABLE_ERRORS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.PoolTimeout,
+    httpx.RemoteProtocolError,
+)
+
+# 可以重试的服务端状态码
+RETRYABLE_STATUS_CODES = (500, 502, 503, 504)
+
+
+class CircuitOpenError(Exception):
+    """熔断中,直接失败不调用 API"""
+
+
+def is_transient(response: httpx.Response) -> bool:
+    return response.status_code in RETRYABLE_STATUS_CODES
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    连续失败达到阈值后打开,在恢复时间内所有调用直接失败;
+    之后进入半开状态,放行一个探测请求,成功则关闭,失败则重新打开
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.open_count = 0
+        self.rejected = 0
+        self._probe_started: Optional[float] = None
+
+    def allow(self):
+        """
+        检查是否允许调用
+
+        Raises:
+            CircuitOpenError: 熔断中
+        """
+        now = time.monotonic()
+        if self.state == "open" and now - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+            self._probe_started = None
+
+        if self.state == "closed":
+            return
+        # 探测请求被取消而没有结果时,超过恢复时间后允许再次探测
+        if self.state == "half_open" and (
+            self._probe_started is None or now - self._probe_started >= self.reset_timeout
+        ):
+            self._probe_started = now
+            return
+
+        self.rejected += 1
+        raise CircuitOpenError("千问服务暂时不可用,请稍后重试")
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probe_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.open_count += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._probe_started = None
+
+    def stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "open_count": self.open_count,
+            "rejected": self.rejected
+        }
+
+
+class LatencyTracker:
+    """最近若干次成功调用的耗时,用于计算对冲请求的等待时间"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class ResiliencePolicy:
+    """单个模型的容错策略"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.breaker = CircuitBreaker(settings.QWEN_BREAKER_FAILURES, settings.QWEN_BREAKER_RESET)
+        self.latency = LatencyTracker()
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _hedge_delay(self) -> Optional[float]:
+        """样本足够时,超过 p95 耗时仍未返回就发出对冲请求"""
+        if not settings.QWEN_HEDGE or len(self.latency) < settings.QWEN_HEDGE_MIN_SAMPLES:
+            return None
+        return max(self.latency.percentile(0.95), settings.QWEN_HEDGE_MIN_DELAY)
+
+    async def _timed(self, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        start = time.monotonic()
+        response = await send()
+        if response.status_code == 200:
+            self.latency.record(time.monotonic() - start)
+        return response
+
+    async def _hedged(self, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        delay = self._hedge_delay()
+        if delay is None:
+            return await self._timed(send)
+
+        primary = asyncio.ensure_future(self._timed(send))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        # 主请求过慢,再发一个,取先成功的结果
+        self.hedges += 1
+        hedge = asyncio.ensure_future(self._timed(send))
+        pending = {primary, hedge}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and not is_transient(task.result()):
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+                if not pending:
+                    # 两个请求都失败,返回(或抛出)后完成的结果
+                    return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(self, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """
+        带重试、对冲和熔断的调用
+
+        连接错误和 5xx 按抖动退避重试;读取超时不重试(模型本身慢,由对冲请求处理);
+        其他状态码直接返回给调用方
+
+        Args:
+            send: 发起一次请求的协程函数
+
+        Returns:
+            HTTP 响应
+
+        Raises:
+            CircuitOpenError: 熔断中
+            httpx.HTTPError: 重试用完后的网络错误
+        """
+        self.breaker.allow()
+
+        attempt = 0
+        while True:
+            try:
+                response = await self._hedged(send)
+            except RETRYABLE_ERRORS:
+                if attempt >= settings.QWEN_MAX_RETRIES:
+                    self.breaker.record_failure()
+                    raise
+            except httpx.TimeoutException:
+                self.breaker.record_failure()
+                raise
+            else:
+                if not is_transient(response):
+                    self.breaker.record_success()
+                    return response
+                if attempt >= settings.QWEN_MAX_RETRIES:
+                    self.breaker.record_failure()
+                    return response
+
+            # 全抖动指数退避
+            self.retries += 1
+            backoff = min(settings.QWEN_RETRY_MAX_DELAY, settings.QWEN_RETRY_BASE_DELAY * (2 ** attempt))
+            await asyncio.sleep(random.uniform(0, backoff))
+            attempt += 1
+
+    def stats(self) -> Dict:
+        p50 = self.latency.percentile(0.5)
+        p95 = self.latency.percentile(0.95)
+        return {
+            "circuit": self.breaker.stats(),
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "latency_p50_ms": round(p50 * 1000) if p50 is not None else None,
+            "latency_p95_ms": round(p95 * 1000) if p95 is not None else None
+        }
+
+
+vision_policy = ResiliencePolicy("vision")
+diet_policy = ResiliencePolicy("diet")
+
+
+def policy_for_model(model: str) -> ResiliencePolicy:
+    """按模型选择容错策略(与限流器的划分一致)"""
+    return vision_policy if model == settings.VISION_MODEL else diet_policy
+
+
+def resilience_stats() -> Dict[str, Dict]:
+    """所有容错策略的状态"""
+    return {policy.name: policy.stats() for policy in (vision_policy, diet_policy)}
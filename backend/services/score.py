@@ -1,4 +1,12 @@
 """运动得分计算服务"""
+from typing import List, Optional, Sequence
+from services.taxonomy import taxonomy
+
+
+def exercise_type_bonus(exercise_type: str) -> int:
+    """运动类型加分(按运动类型表匹配,结果缓存)"""
+    return taxonomy.bonus(exercise_type)
+
 
 def calculate_score(record: dict) -> int:
     """
@@ -20,11 +28,11 @@ def calculate_score(record: dict) -> int:
     score = 0.0
     
     # 1. 时长得分: duration_min / 3 (运动 30 分钟 = 10 分)
-    duration_min = record.get("duration_min", 0)
+    duration_min = record.get("duration_min") or 0
     score += duration_min / 3
     
     # 2. 卡路里得分: calories / 25 (消耗 250 卡路里 = 10 分)
-    calories = record.get("calories", 0)
+    calories = record.get("calories") or 0
     score += calories / 25
     
     # 3. 心率得分: avg_heart_rate / 20 (平均心率 120 = 6 分)
@@ -33,18 +41,9 @@ def calculate_score(record: dict) -> int:
         score += avg_heart_rate / 20
     
     # 4. 运动类型加分
-    type_bonus = {
-        "羽毛球": 5,
-        "篮球": 5,
-        "游泳": 8,
-        "跑步": 3,
-        "骑行": 3,
-    }
-    exercise_type_lower = exercise_type.lower()
-    for key, bonus in type_bonus.items():
-        if key in exercise_type_lower:
-            score += bonus
-            break
+    bonus = exercise_type_bonus(exercise_type)
+    if bonus:
+        score += bonus
     
     # 5. 步数加分
     steps = record.get("steps")
@@ -72,7 +71,7 @@ def calculate_daily_steps_score(record: dict) -> int:
     score = 0.0
     
     # 1. 步数得分（主要指标）
-    steps = record.get("steps", 0)
+    steps = record.get("steps") or 0
     if steps >= 20000:
         score += 50  # 超过2万步，满分
     elif steps >= 15000:
@@ -85,7 +84,7 @@ def calculate_daily_steps_score(record: dict) -> int:
         score += steps / 250  # 低于5千步，按比例计算
     
     # 2. 卡路里得分
-    calories = record.get("calories", 0)
+    calories = record.get("calories") or 0
     if calories >= 1000:
         score += 30
     elif calories >= 600:
@@ -102,3 +101,73 @@ def calculate_daily_steps_score(record: dict) -> int:
     # 确保得分在 0-100 范围内
     final_score = min(int(round(score)), 100)
     return max(final_score, 0)
+
+
+def calculate_scores(exercise_types: Sequence[str], duration_min: Sequence[int], calories: Sequence[int],
+                     avg_heart_rate: Sequence[Optional[int]], steps: Sequence[Optional[int]]) -> List[int]:
+    """
+    批量计算运动得分(按列传入,用于重算历史记录)
+
+    结果与逐条调用 calculate_score 完全相同;安装了 NumPy 时按列向量化计算,
+    否则逐条计算
+
+    Args:
+        exercise_types: 运动类型列
+        duration_min: 时长列
+        calories: 卡路里列
+        avg_heart_rate: 平均心率列(可为 None)
+        steps: 步数列(可为 None)
+
+    Returns:
+        每条记录的整数得分 (0-100)
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return [
+            calculate_score({
+                "exercise_type": exercise_type,
+                "duration_min": duration,
+                "calories": calorie,
+                "avg_heart_rate": heart_rate,
+                "steps": step
+            })
+            for exercise_type, duration, calorie, heart_rate, step
+            in zip(exercise_types, duration_min, calories, avg_heart_rate, steps)
+        ]
+
+    if not exercise_types:
+        return []
+
+    types = np.asarray(exercise_types, dtype=object)
+    # None 与 0 等价(与标量版本一致)
+    duration = np.asarray([value or 0 for value in duration_min], dtype=np.float64)
+    calorie = np.asarray([value or 0 for value in calories], dtype=np.float64)
+    heart_rate = np.asarray([value or 0 for value in avg_heart_rate], dtype=np.float64)
+    step = np.asarray([value or 0 for value in steps], dtype=np.float64)
+
+    # 运动类型加分: 每种类型只匹配一次,再按类型查表
+    bonus_by_type = {exercise_type: exercise_type_bonus(exercise_type) for exercise_type in set(exercise_types)}
+    bonus = np.fromiter(map(bonus_by_type.__getitem__, exercise_types), dtype=np.float64, count=len(types))
+
+    # 单次运动: 与 calculate_score 相同的加法顺序,保证浮点结果一致
+    score = duration / 3
+    score = score + calorie / 25
+    score = score + heart_rate / 20
+    score = score + bonus
+    score = score + np.where(step > 10000, 5.0, np.where(step > 5000, 3.0, 0.0))
+
+    # 每日步数总结: 与 calculate_daily_steps_score 相同
+    daily = np.where(
+        step >= 20000, 50.0, np.where(
+            step >= 15000, 40.0, np.where(
+                step >= 10000, 30.0, np.where(step >= 5000, 20.0, step / 250))))
+    daily = daily + np.where(
+        calorie >= 1000, 30.0, np.where(
+            calorie >= 600, 20.0, np.where(calorie >= 300, 10.0, calorie / 30)))
+    daily = daily + np.where((step >= 15000) & (calorie >= 600), 20.0, 0.0)
+
+    score = np.where(types == "每日步数", daily, score)
+
+    # round 与 np.rint 都是四舍六入五成双
+    return np.clip(np.rint(score), 0, 100).astype(np.int64).tolist()
@@ -0,0 +1,139 @@
+"""HMAC 签名的无状态令牌"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import delete
+from sqlmodel import Session, select
+from config import settings
+from database import engine
+from models import RevokedToken
+
+
+def _load_secret() -> bytes:
+    if settings.TOKEN_SECRET:
+        return settings.TOKEN_SECRET.encode()
+    if settings.TOKEN_MODE == "signed":
+        print("⚠️ 未设置 TOKEN_SECRET,使用随机密钥(重启后令牌失效,多 worker 之间不通用)")
+    return secrets.token_bytes(32)
+
+
+SECRET_KEY = _load_secret()
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(SECRET_KEY, payload.encode(), hashlib.sha256).digest())
+
+
+def issue_signed_token(user_id: int, expires_at: datetime) -> str:
+    """
+    签发令牌
+
+    格式: base64url({"u": 用户ID, "e": 过期时间戳, "j": 唯一标识}).签名
+    """
+    payload = _b64encode(json.dumps(
+        {"u": user_id, "e": int(expires_at.timestamp()), "j": secrets.token_hex(8)},
+        separators=(",", ":")
+    ).encode())
+    return f"{payload}.{_sign(payload)}"
+
+
+def decode_signed_token(token: str) -> Optional[Dict]:
+    """
+    校验签名和过期时间(不访问任何存储)
+
+    Returns:
+        令牌内容 {"u", "e", "j"},无效或过期时返回 None
+    """
+    payload, sep, signature = token.partition(".")
+    # 按字节比较: compare_digest 遇到非 ASCII 字符串会抛 TypeError
+    if not sep or not hmac.compare_digest(signature.encode(), _sign(payload).encode()):
+        return None
+
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+
+    if time.time() > claims["e"]:
+        return None
+    return claims
+
+
+class RevocationList:
+    """
+    登出吊销列表
+
+    进程内保存未过期的吊销记录,校验时只查内存;
+    同时写入 revoked_tokens 表,其他 worker 定期同步
+    """
+
+    def __init__(self):
+        self._revoked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def revoke(self, jti: str, expires_at: float):
+        with self._lock:
+            self._revoked[jti] = expires_at
+        with Session(engine) as session:
+            session.merge(RevokedToken(jti=jti, expires_at=datetime.fromtimestamp(expires_at)))
+            session.commit()
+
+    def is_revoked(self, jti: str) -> bool:
+        return jti in self._revoked
+
+    def sync(self):
+        """从数据库加载其他 worker 的吊销记录,并清理已过期的记录"""
+        now = datetime.now()
+        with Session(engine) as session:
+            session.execute(delete(RevokedToken).where(RevokedToken.expires_at < now))
+            session.commit()
+            rows = session.exec(select(RevokedToken)).all()
+        revoked = {row.jti: row.expires_at.timestamp() for row in rows}
+        with self._lock:
+            self._revoked = revoked
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+
+revocation_list = RevocationList()
+
+
+def verify_signed_token(token: str) -> Optional[int]:
+    """校验令牌并返回用户 ID,无效、过期或已吊销时返回 None"""
+    claims = decode_signed_token(token)
+    if claims is None or revocation_list.is_revoked(claims["j"]):
+        return None
+    return claims["u"]
+
+
+def revoke_signed_token(token: str):
+    """吊销令牌(登出)"""
+    claims = decode_signed_token(token)
+    if claims is not None:
+        revocation_list.revoke(claims["j"], claims["e"])
+
+
+async def sync_revocations(interval: int):
+    """后台定期同步吊销列表"""
+    while True:
+        try:
+            await asyncio.to_thread(revocation_list.sync)
+        except Exception as e:
+            print(f"吊销列表同步失败: {str(e)}")
+        await asyncio.sleep(interval)
@@ -1,9 +1,11 @@
 """每日任务生成服务"""
 import random
 from datetime import date
-from typing import List
+from typing import List, Optional, Tuple
+from sqlalchemy import update
 from sqlmodel import Session, select
 from models import DailyTask
+from services.trends import add_task_points, refresh_daily_summary
 
 
 # 任务池
@@ -72,9 +74,10 @@ def generate_daily_tasks(session: Session, user_id: int, task_date: date) -> Lis
         if len(selected_tasks) >= 5:
             break
     
-    # 批量插入数据库
+    # 批量插入数据库(任务总数变化,同步更新每日汇总)
     for task in selected_tasks:
         session.add(task)
+    refresh_daily_summary(session, user_id, task_date)
     session.commit()
     
     # 刷新对象以获取生成的 ID
@@ -82,3 +85,37 @@ def generate_daily_tasks(session: Session, user_id: int, task_date: date) -> Lis
         session.refresh(task)
     
     return selected_tasks
+
+
+def complete_task(session: Session, task_id: int, user_id: int) -> Optional[Tuple[int, date, int]]:
+    """
+    完成任务并累加积分(幂等)
+
+    条件更新 done = false -> true,只有真正把任务从未完成改为完成的请求才累加积分,
+    多端同时点击或重复提交不会重复计分。任务更新、每日汇总累加和排行榜积分是多条语句,
+    幂等依赖它们在同一事务中执行,由调用方提交
+
+    Args:
+        session: 数据库会话
+        task_id: 任务ID
+        user_id: 用户ID
+
+    Returns:
+        (任务奖励积分, 任务日期, 当日任务积分合计),任务不存在、不属于该用户或已完成时返回 None
+    """
+    statement = update(DailyTask).where(
+        DailyTask.id == task_id,
+        DailyTask.user_id == user_id,
+        DailyTask.done == False
+    ).values(done=True).returning(
+        DailyTask.reward_points,
+        DailyTask.date
+    ).execution_options(synchronize_session=False)
+
+    row = session.execute(statement).first()
+    if row is None:
+        return None
+
+    reward_points, task_date = row
+    total_points = add_task_points(session, user_id, task_date, reward_points)
+    return reward_points, task_date, total_points
@@ -0,0 +1,152 @@
+"""运动类型分类服务(规范名称、别名、加分和 MET 值)"""
+import json
+import re
+import unicodedata
+from collections import deque
+from functools import lru_cache
+from typing import Dict, List, Optional
+from config import settings
+
+
+# 运动类型表,顺序即匹配优先级: 名称中包含多个运动时取排在前面的
+# (与原先按 type_bonus 顺序取第一个包含的关键字一致)
+# bonus: 得分加分 / met: 代谢当量(MET,用于按时长和体重估算消耗)
+EXERCISE_TYPES: List[Dict] = [
+    {"name": "羽毛球", "aliases": ["badminton"], "bonus": 5, "met": 5.5},
+    {"name": "篮球", "aliases": ["basketball"], "bonus": 5, "met": 6.5},
+    {"name": "游泳", "aliases": ["泳池", "开放水域", "自由泳", "蛙泳", "仰泳", "蝶泳", "swim"], "bonus": 8, "met": 7.0},
+    {"name": "跑步", "aliases": ["跑步机", "慢跑", "长跑", "越野跑", "马拉松", "running"], "bonus": 3, "met": 9.8},
+    {"name": "骑行", "aliases": ["自行车", "单车", "动感单车", "cycling", "bike"], "bonus": 3, "met": 7.5},
+    {"name": "每日步数", "aliases": [], "bonus": 0, "met": None},
+    {"name": "步行", "aliases": ["健走", "散步", "walk"], "bonus": 0, "met": 3.5},
+    {"name": "徒步", "aliases": ["登山", "爬山", "hiking"], "bonus": 0, "met": 6.0},
+    {"name": "乒乓球", "aliases": ["table tennis"], "bonus": 0, "met": 4.0},
+    {"name": "网球", "aliases": ["tennis"], "bonus": 0, "met": 7.3},
+    {"name": "足球", "aliases": ["soccer", "football"], "bonus": 0, "met": 7.0},
+    {"name": "排球", "aliases": ["volleyball"], "bonus": 0, "met": 4.0},
+    {"name": "跳绳", "aliases": ["jump rope"], "bonus": 0, "met": 11.8},
+    {"name": "椭圆机", "aliases": ["elliptical"], "bonus": 0, "met": 5.0},
+    {"name": "划船机", "aliases": ["划船", "rowing"], "bonus": 0, "met": 7.0},
+    {"name": "爬楼", "aliases": ["爬楼梯", "stair"], "bonus": 0, "met": 8.0},
+    {"name": "高强度间歇训练", "aliases": ["hiit", "间歇训练"], "bonus": 0, "met": 8.0},
+    {"name": "力量训练", "aliases": ["举重", "撸铁", "器械训练", "strength"], "bonus": 0, "met": 5.0},
+    {"name": "瑜伽", "aliases": ["普拉提", "yoga", "pilates"], "bonus": 0, "met": 2.5},
+    {"name": "跳舞", "aliases": ["舞蹈", "健身操", "尊巴", "dance"], "bonus": 0, "met": 5.0},
+]
+
+
+def normalize_exercise_name(name: str) -> str:
+    """规范化运动名称: 全角转半角、合并空白、小写"""
+    name = unicodedata.normalize("NFKC", name)
+    return re.sub(r"\s+", " ", name).strip().lower()
+
+
+class ExerciseTaxonomy:
+    """
+    运动类型匹配器
+
+    所有名称和别名编译为 Aho-Corasick 自动机,一次扫描找出名称中出现的全部关键字,
+    匹配耗时只与名称长度有关,与运动类型数量无关
+    """
+
+    def __init__(self, exercise_types: List[Dict]):
+        self.exercise_types = exercise_types
+        # 状态转移、失败指针、每个状态匹配到的最高优先级(运动类型下标)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._best: List[Optional[int]] = [None]
+
+        for priority, exercise_type in enumerate(exercise_types):
+            for keyword in [exercise_type["name"], *exercise_type.get("aliases", [])]:
+                self._add(normalize_exercise_name(keyword), priority)
+        self._build_fail_links()
+
+        self.match = lru_cache(maxsize=4096)(self._match)
+
+    def _add(self, keyword: str, priority: int):
+        state = 0
+        for ch in keyword:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(None)
+            state = next_state
+        if self._best[state] is None or priority < self._best[state]:
+            self._best[state] = priority
+
+    def _build_fail_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(ch, 0)
+                # 后缀匹配到的关键字也算当前状态的匹配
+                inherited = self._best[self._fail[next_state]]
+                if inherited is not None and (self._best[next_state] is None or inherited < self._best[next_state]):
+                    self._best[next_state] = inherited
+
+    def _match(self, name: str) -> Optional[Dict]:
+        best = None
+        state = 0
+        for ch in normalize_exercise_name(name):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            priority = self._best[state]
+            if priority is not None and (best is None or priority < best):
+                best = priority
+                if best == 0:
+                    break
+        return self.exercise_types[best] if best is not None else None
+
+    def bonus(self, name: str) -> int:
+        """运动类型加分,未知类型为 0"""
+        exercise_type = self.match(name)
+        return exercise_type["bonus"] if exercise_type else 0
+
+    def met(self, name: str) -> Optional[float]:
+        """运动类型的 MET 值,未知类型返回 None"""
+        exercise_type = self.match(name)
+        return exercise_type["met"] if exercise_type else None
+
+    def normalize(self, name: str) -> str:
+        """规范名称(如"户外跑步"/"跑步机" -> "跑步"),未知类型原样返回"""
+        exercise_type = self.match(name)
+        return exercise_type["name"] if exercise_type else name.strip()
+
+
+def load_exercise_types() -> List[Dict]:
+    """
+    读取运动类型表
+
+    配置了 EXERCISE_TAXONOMY_FILE 时从 JSON 文件读取(格式与 EXERCISE_TYPES 相同,整体替换内置表)
+    """
+    path = settings.EXERCISE_TAXONOMY_FILE
+    if not path:
+        return EXERCISE_TYPES
+
+    with open(path, encoding="utf-8") as f:
+        exercise_types = json.load(f)
+    for exercise_type in exercise_types:
+        if not exercise_type.get("name"):
+            raise ValueError(f"运动类型缺少名称: {exercise_type}")
+        exercise_type.setdefault("aliases", [])
+        exercise_type.setdefault("bonus", 0)
+        exercise_type.setdefault("met", None)
+    return exercise_types
+
+
+# 启动时编译
+taxonomy = ExerciseTaxonomy(load_exercise_types())
+
+
+def normalize_exercise_type(name: str) -> str:
+    """将运动类型规范为分类表中的名称"""
+    return taxonomy.normalize(name)
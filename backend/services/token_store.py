@@ -0,0 +1,223 @@
+"""登录令牌存储服务"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import delete
+from sqlmodel import Session
+from config import settings
+from database import engine
+from models import AuthToken
+
+
+def hash_token(token: str) -> str:
+    """令牌摘要(共享存储中不保存明文令牌)"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenStore:
+    """令牌存储接口"""
+
+    backend = ""
+
+    def set(self, token: str, user_id: int, expires_at: datetime):
+        raise NotImplementedError
+
+    def get(self, token: str) -> Optional[Dict]:
+        """
+        读取令牌
+
+        Returns:
+            {"user_id": ..., "expires_at": ...},不存在或已过期时返回 None
+        """
+        raise NotImplementedError
+
+    def delete(self, token: str):
+        raise NotImplementedError
+
+    def sweep(self) -> int:
+        """清理过期令牌,返回清理数量"""
+        return 0
+
+
+class MemoryTokenStore(TokenStore):
+    """进程内令牌存储(LRU,超出上限时淘汰最久未使用的令牌)"""
+
+    backend = "memory"
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._tokens: "OrderedDict[str, Dict]" = OrderedDict()
+        # 同步路由运行在线程池中,需要加锁
+        self._lock = threading.Lock()
+
+    def set(self, token: str, user_id: int, expires_at: datetime):
+        with self._lock:
+            self._tokens[token] = {"user_id": user_id, "expires_at": expires_at}
+            self._tokens.move_to_end(token)
+            while len(self._tokens) > self.max_size:
+                self._tokens.popitem(last=False)
+
+    def get(self, token: str) -> Optional[Dict]:
+        with self._lock:
+            token_data = self._tokens.get(token)
+            if token_data is None:
+                return None
+            if datetime.now() > token_data["expires_at"]:
+                del self._tokens[token]
+                return None
+            self._tokens.move_to_end(token)
+            return token_data
+
+    def delete(self, token: str):
+        with self._lock:
+            self._tokens.pop(token, None)
+
+    def sweep(self) -> int:
+        now = datetime.now()
+        with self._lock:
+            expired = [token for token, data in self._tokens.items() if now > data["expires_at"]]
+            for token in expired:
+                del self._tokens[token]
+        return len(expired)
+
+
+class DatabaseTokenStore(TokenStore):
+    """数据库表令牌存储(多个 worker 共享)"""
+
+    backend = "database"
+
+    def set(self, token: str, user_id: int, expires_at: datetime):
+        with Session(engine) as session:
+            session.add(AuthToken(token_hash=hash_token(token), user_id=user_id, expires_at=expires_at))
+            session.commit()
+
+    def get(self, token: str) -> Optional[Dict]:
+        with Session(engine) as session:
+            record = session.get(AuthToken, hash_token(token))
+            if record is None:
+                return None
+            if datetime.now() > record.expires_at:
+                session.delete(record)
+                session.commit()
+                return None
+            return {"user_id": record.user_id, "expires_at": record.expires_at}
+
+    def delete(self, token: str):
+        with Session(engine) as session:
+            session.execute(delete(AuthToken).where(AuthToken.token_hash == hash_token(token)))
+            session.commit()
+
+    def sweep(self) -> int:
+        with Session(engine) as session:
+            result = session.execute(delete(AuthToken).where(AuthToken.expires_at < datetime.now()))
+            session.commit()
+            return result.rowcount
+
+
+class LocalRedis:
+    """
+    进程内的 Redis 替代实现
+
+    只实现令牌存储用到的 get/set/delete 命令,用于未部署 Redis 的环境
+    """
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def set(self, name: str, value: str, ex: Optional[int] = None):
+        expires_at = time.monotonic() + ex if ex else None
+        with self._lock:
+            self._data[name] = (value, expires_at)
+        return True
+
+    def get(self, name: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(name)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and time.monotonic() > expires_at:
+                del self._data[name]
+                return None
+            return value
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            return sum(1 for name in names if self._data.pop(name, None) is not None)
+
+    def sweep(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            expired = [name for name, (_, expires_at) in self._data.items()
+                       if expires_at is not None and now > expires_at]
+            for name in expired:
+                del self._data[name]
+        return len(expired)
+
+
+class RedisTokenStore(TokenStore):
+    """Redis 令牌存储,过期由 Redis TTL 负责"""
+
+    backend = "redis"
+    prefix = "familyfit:token:"
+
+    def __init__(self, client):
+        self.client = client
+
+    def set(self, token: str, user_id: int, expires_at: datetime):
+        ttl = max(int((expires_at - datetime.now()).total_seconds()), 1)
+        value = json.dumps({"user_id": user_id, "expires_at": expires_at.isoformat()})
+        self.client.set(self.prefix + hash_token(token), value, ex=ttl)
+
+    def get(self, token: str) -> Optional[Dict]:
+        value = self.client.get(self.prefix + hash_token(token))
+        if value is None:
+            return None
+        token_data = json.loads(value)
+        expires_at = datetime.fromisoformat(token_data["expires_at"])
+        # TTL 按秒取整,这里再精确判断一次
+        if datetime.now() > expires_at:
+            return None
+        return {"user_id": token_data["user_id"], "expires_at": expires_at}
+
+    def delete(self, token: str):
+        self.client.delete(self.prefix + hash_token(token))
+
+    def sweep(self) -> int:
+        # 真实 Redis 自行过期,本地替代实现需要主动清理
+        if isinstance(self.client, LocalRedis):
+            return self.client.sweep()
+        return 0
+
+
+def create_token_store() -> TokenStore:
+    """按配置创建令牌存储"""
+    if settings.TOKEN_STORE == "database":
+        return DatabaseTokenStore()
+
+    if settings.TOKEN_STORE == "redis":
+        if settings.REDIS_URL:
+            import redis
+            return RedisTokenStore(redis.Redis.from_url(settings.REDIS_URL, decode_responses=True))
+        print("⚠️ 未设置 REDIS_URL,令牌存储使用进程内替代实现")
+        return RedisTokenStore(LocalRedis())
+
+    return MemoryTokenStore(settings.TOKEN_STORE_MAX_SIZE)
+
+
+async def sweep_expired_tokens(store: TokenStore, interval: int):
+    """后台定期清理过期令牌"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            removed = await asyncio.to_thread(store.sweep)
+            if removed:
+                print(f"🧹 已清理过期令牌 {removed} 个")
+        except Exception as e:
+            print(f"令牌清理失败: {str(e)}")
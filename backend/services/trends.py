@@ -0,0 +1,352 @@
+"""健康趋势统计服务"""
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select, func, case
+from models import DailySummary, DailyTask, ExerciseRecord, MealRecord, User
+from services.leaderboard import credit_points, rebuild_leaderboard
+
+# 每日汇总的指标字段(与 DailySummary 列一致)
+METRIC_FIELDS = (
+    "exercise_calories",
+    "exercise_duration",
+    "exercise_steps",
+    "exercise_score_sum",
+    "meal_calories",
+    "meal_score_sum",
+    "meal_count",
+    "task_total",
+    "task_done",
+    "task_points",
+)
+
+
+def empty_daily_metrics() -> Dict:
+    """没有任何记录的一天"""
+    return {field: 0 for field in METRIC_FIELDS}
+
+
+def query_daily_metrics(session: Session, user_id: int, start_date: date, end_date: date) -> Dict[date, Dict]:
+    """
+    按日期聚合运动、饮食和任务数据(每张表一条 GROUP BY 查询)
+
+    Args:
+        session: 数据库会话
+        user_id: 用户ID
+        start_date: 开始日期(含)
+        end_date: 结束日期(含)
+
+    Returns:
+        {日期: 当日指标},没有记录的日期不包含在内
+    """
+    metrics: Dict[date, Dict] = {}
+
+    def day(d: date) -> Dict:
+        if d not in metrics:
+            metrics[d] = empty_daily_metrics()
+        return metrics[d]
+
+    # 运动数据
+    exercise_statement = select(
+        ExerciseRecord.date,
+        func.sum(ExerciseRecord.calories),
+        func.sum(ExerciseRecord.duration_min),
+        func.sum(func.coalesce(ExerciseRecord.steps, 0)),
+        func.sum(ExerciseRecord.score)
+    ).where(
+        ExerciseRecord.user_id == user_id,
+        ExerciseRecord.date >= start_date,
+        ExerciseRecord.date <= end_date
+    ).group_by(ExerciseRecord.date)
+
+    for d, calories, duration, steps, score_sum in session.exec(exercise_statement):
+        m = day(d)
+        m["exercise_calories"] = calories or 0
+        m["exercise_duration"] = duration or 0
+        m["exercise_steps"] = steps or 0
+        m["exercise_score_sum"] = score_sum or 0
+
+    # 饮食数据
+    meal_statement = select(
+        MealRecord.date,
+        func.sum(func.coalesce(MealRecord.total_calories, 0)),
+        func.sum(MealRecord.health_score),
+        func.count()
+    ).where(
+        MealRecord.user_id == user_id,
+        MealRecord.date >= start_date,
+        MealRecord.date <= end_date
+    ).group_by(MealRecord.date)
+
+    for d, calories, score_sum, count in session.exec(meal_statement):
+        m = day(d)
+        m["meal_calories"] = calories or 0
+        m["meal_score_sum"] = score_sum or 0
+        m["meal_count"] = count
+
+    # 任务数据
+    task_statement = select(
+        DailyTask.date,
+        func.count(),
+        func.sum(case((DailyTask.done == True, 1), else_=0)),
+        func.sum(case((DailyTask.done == True, DailyTask.reward_points), else_=0))
+    ).where(
+        DailyTask.user_id == user_id,
+        DailyTask.date >= start_date,
+        DailyTask.date <= end_date
+    ).group_by(DailyTask.date)
+
+    for d, total, done, points in session.exec(task_statement):
+        m = day(d)
+        m["task_total"] = total
+        m["task_done"] = done or 0
+        m["task_points"] = points or 0
+
+    return metrics
+
+
+def calculate_daily_score(exercise_score: int, meal_score: int, task_points: int) -> int:
+    """
+    综合得分计算
+
+    如果三项都有数据: (运动得分 × 0.4 + 饮食得分 × 0.4 + 任务积分 × 0.2),
+    缺失的项不参与加权
+    """
+    total_score = 0
+    weight_sum = 0
+
+    if exercise_score > 0:
+        total_score += exercise_score * 0.4
+        weight_sum += 0.4
+
+    if meal_score > 0:
+        total_score += meal_score * 0.4
+        weight_sum += 0.4
+
+    if task_points > 0:
+        # 任务积分归一化到 0-100
+        normalized_task_score = min(task_points, 100)
+        total_score += normalized_task_score * 0.2
+        weight_sum += 0.2
+
+    # 按权重归一化
+    return int(total_score / weight_sum) if weight_sum > 0 else 0
+
+
+def daily_score_from_metrics(metrics: Dict) -> int:
+    """根据当日指标计算综合得分"""
+    exercise_score = min(metrics["exercise_score_sum"], 100)
+    avg_meal_score = int(metrics["meal_score_sum"] / metrics["meal_count"]) if metrics["meal_count"] else 0
+    return calculate_daily_score(exercise_score, avg_meal_score, metrics["task_points"])
+
+
+def _upsert_summaries(session: Session, rows: List[Dict]):
+    """写入每日汇总(主键冲突时更新)"""
+    if not rows:
+        return
+    
+    dialect = session.get_bind().dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        for row in rows:
+            session.merge(DailySummary(**row))
+        return
+    
+    insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+    statement = insert(DailySummary).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=["user_id", "date"],
+        set_={key: statement.excluded[key] for key in rows[0] if key not in ("user_id", "date")}
+    )
+    session.execute(statement)
+
+
+def _summary_row(user_id: int, d: date, metrics: Dict) -> Dict:
+    return {
+        "user_id": user_id,
+        "date": d,
+        **{field: metrics[field] for field in METRIC_FIELDS},
+        "daily_score": daily_score_from_metrics(metrics),
+        "updated_at": datetime.now()
+    }
+
+
+def refresh_daily_summary(session: Session, user_id: int, day: date) -> Dict:
+    """
+    重新汇总某个用户某一天的数据
+
+    在写入记录的同一事务中调用(先写记录再汇总),由调用方提交;
+    综合得分的变化同时计入排行榜积分
+
+    Args:
+        session: 数据库会话
+        user_id: 用户ID
+        day: 日期
+
+    Returns:
+        重新计算后的当日汇总(指标和综合得分)
+    """
+    previous_score = session.exec(
+        select(DailySummary.daily_score).where(DailySummary.user_id == user_id, DailySummary.date == day)
+    ).first() or 0
+    
+    metrics = query_daily_metrics(session, user_id, day, day).get(day) or empty_daily_metrics()
+    row = _summary_row(user_id, day, metrics)
+    _upsert_summaries(session, [row])
+    credit_points(session, user_id, day, row["daily_score"] - previous_score)
+    return row
+
+
+def add_task_points(session: Session, user_id: int, day: date, points: int) -> int:
+    """
+    完成一个任务后原子地累加当日的任务数和任务积分
+
+    UPDATE ... RETURNING 累加并读回当日指标,得分变化时再更新综合得分并计入排行榜;
+    这几条语句与调用方的任务更新在同一事务中(并发完成时由数据库行锁串行,不会丢失更新),
+    由调用方提交
+
+    Args:
+        session: 数据库会话
+        user_id: 用户ID
+        day: 任务日期
+        points: 任务奖励积分
+
+    Returns:
+        当日任务积分合计
+    """
+    statement = update(DailySummary).where(
+        DailySummary.user_id == user_id,
+        DailySummary.date == day
+    ).values(
+        task_done=DailySummary.task_done + 1,
+        task_points=DailySummary.task_points + points,
+        updated_at=datetime.now()
+    ).returning(
+        *(getattr(DailySummary, field) for field in METRIC_FIELDS),
+        DailySummary.daily_score
+    ).execution_options(synchronize_session=False)
+    
+    row = session.execute(statement).first()
+    if row is None:
+        # 还没有当日汇总(任务生成前的旧数据),从原始记录完整汇总一次,
+        # 本次完成的任务已在同一事务中标记,合计包含它和当天之前完成的任务
+        return refresh_daily_summary(session, user_id, day)["task_points"]
+    
+    metrics = dict(zip(METRIC_FIELDS, row))
+    previous_score = row[-1]
+    daily_score = daily_score_from_metrics(metrics)
+    if daily_score != previous_score:
+        session.execute(
+            update(DailySummary).where(
+                DailySummary.user_id == user_id,
+                DailySummary.date == day
+            ).values(daily_score=daily_score).execution_options(synchronize_session=False)
+        )
+        credit_points(session, user_id, day, daily_score - previous_score)
+    
+    return metrics["task_points"]
+
+
+def rebuild_daily_summaries(session: Session, user_id: Optional[int] = None) -> int:
+    """
+    根据原始记录重建每日汇总和排行榜积分(回填历史数据)
+
+    Args:
+        session: 数据库会话
+        user_id: 只重建指定用户,为空时重建全部用户
+
+    Returns:
+        写入的汇总行数
+    """
+    if user_id is None:
+        user_ids = session.exec(select(User.id)).all()
+    else:
+        user_ids = [user_id]
+    
+    count = 0
+    for uid in user_ids:
+        metrics = query_daily_metrics(session, uid, date.min, date.max)
+        rows = [_summary_row(uid, d, m) for d, m in metrics.items()]
+        # 分批写入,避免超出 SQLite 单条语句的参数上限
+        for i in range(0, len(rows), 500):
+            _upsert_summaries(session, rows[i:i + 500])
+        rebuild_leaderboard(session, uid)
+        count += len(rows)
+    
+    session.commit()
+    return count
+
+
+def load_daily_summaries(session: Session, user_id: int, start_date: date, end_date: date) -> Dict[date, Dict]:
+    """
+    读取日期范围内的每日汇总(主键范围扫描)
+
+    Returns:
+        {日期: 当日指标}
+    """
+    statement = select(DailySummary).where(
+        DailySummary.user_id == user_id,
+        DailySummary.date >= start_date,
+        DailySummary.date <= end_date
+    )
+    return {
+        summary.date: {field: getattr(summary, field) for field in METRIC_FIELDS}
+        for summary in session.exec(statement)
+    }
+
+
+def build_trends(metrics: Dict[date, Dict], start_date: date, days: int) -> Dict:
+    """
+    将每日指标整理为趋势接口的返回格式
+
+    Args:
+        metrics: {日期: 当日指标}
+        start_date: 开始日期
+        days: 天数
+
+    Returns:
+        趋势数据
+    """
+    daily_scores: List[Dict] = []
+    exercise_calories: List[int] = []
+    exercise_durations: List[int] = []
+    exercise_steps: List[int] = []
+    diet_scores: List[int] = []
+    diet_calories: List[int] = []
+    task_rates: List[Dict] = []
+
+    for i in range(days):
+        d = start_date + timedelta(days=i)
+        m = metrics.get(d) or empty_daily_metrics()
+
+        # 运动数据
+        exercise_calories.append(m["exercise_calories"])
+        exercise_durations.append(m["exercise_duration"])
+        exercise_steps.append(m["exercise_steps"])
+
+        # 饮食数据
+        avg_meal_score = int(m["meal_score_sum"] / m["meal_count"]) if m["meal_count"] else 0
+        diet_calories.append(m["meal_calories"])
+        diet_scores.append(avg_meal_score)
+
+        # 任务数据
+        task_rate = int((m["task_done"] / m["task_total"] * 100)) if m["task_total"] > 0 else 0
+        task_rates.append({"date": str(d), "rate": task_rate})
+
+        final_score = daily_score_from_metrics(m)
+        daily_scores.append({"date": str(d), "score": final_score})
+
+    return {
+        "daily_scores": daily_scores,
+        "exercise_trends": {
+            "calories": exercise_calories,
+            "duration": exercise_durations,
+            "steps": exercise_steps
+        },
+        "task_completion_rate": task_rates,
+        "diet_trends": {
+            "avg_health_scores": diet_scores,
+            "daily_calories": diet_calories
+        }
+    }
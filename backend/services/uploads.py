@@ -0,0 +1,165 @@
+"""上传文件处理服务(分块读取,不把整个文件放进内存)"""
+import hashlib
+import tempfile
+from typing import Dict, Optional
+from fastapi import UploadFile
+from fastapi.responses import JSONResponse
+from config import settings
+
+
+# 文件头魔数 -> MIME 类型(不信任客户端声明的 Content-Type)
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+)
+
+# multipart 边界、表单字段等额外开销
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadError(ValueError):
+    """上传文件不符合要求(大小或格式)"""
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """根据文件头判断图片类型,不支持的格式返回 None"""
+    for signature, mime_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    return None
+
+
+def size_limit_message(max_size: int) -> str:
+    return f"文件大小超过限制(最大{max_size // (1024 * 1024)}MB)"
+
+
+class SpooledUpload:
+    """
+    已读取的上传文件
+
+    小文件保存在内存中,超过 UPLOAD_SPOOL_THRESHOLD 后写入 UPLOAD_DIR 下的临时文件,
+    关闭时自动删除
+    """
+
+    def __init__(self, file, size: int, content_type: str, sha256: str):
+        self.file = file
+        self.size = size
+        self.content_type = content_type
+        self.sha256 = sha256
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+async def read_upload(file: UploadFile, max_size: Optional[int] = None) -> SpooledUpload:
+    """
+    分块读取上传图片,边读边校验大小和格式
+
+    Args:
+        file: 上传文件
+        max_size: 最大字节数,默认 MAX_FILE_SIZE
+
+    Returns:
+        读取完成的文件(指针位于开头),调用方负责关闭
+
+    Raises:
+        UploadError: 文件过大或不是 jpg/png
+    """
+    max_size = max_size or settings.MAX_FILE_SIZE
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.UPLOAD_SPOOL_THRESHOLD, dir=settings.UPLOAD_DIR)
+    digest = hashlib.sha256()
+    size = 0
+    content_type = None
+
+    try:
+        while True:
+            chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+
+            # 第一个分块判断文件类型,不合法时不再继续读取
+            if content_type is None:
+                content_type = sniff_image_type(chunk)
+                if content_type is None:
+                    raise UploadError("文件格式不支持,仅支持 jpg/png")
+
+            size += len(chunk)
+            if size > max_size:
+                raise UploadError(size_limit_message(max_size))
+
+            digest.update(chunk)
+            spool.write(chunk)
+
+        if content_type is None:
+            raise UploadError("文件为空")
+    except BaseException:
+        spool.close()
+        raise
+
+    spool.seek(0)
+    return SpooledUpload(spool, size, content_type, digest.hexdigest())
+
+
+class UploadSizeLimitMiddleware:
+    """
+    在解析 multipart 请求体之前限制上传接口的请求大小
+
+    Content-Length 超限时直接返回 413;没有 Content-Length(分块传输)时边接收边计数,
+    超限后停止读取请求体
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        """
+        Args:
+            app: ASGI 应用
+            limits: {路径: 请求体最大字节数}
+        """
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.limits:
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.limits[scope["path"]]
+        rejected = JSONResponse(status_code=413, content={"detail": "上传内容超过大小限制"})
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await rejected(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            # 超限后丢弃应用自己的错误响应,统一返回 413
+            if not exceeded:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+
+        if exceeded:
+            await rejected(scope, receive, send)
@@ -1,10 +1,18 @@
 """运动截图 Vision 识别服务"""
+import asyncio
 import base64
+import hashlib
 import json
-import httpx
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
-from typing import Dict, Optional
+from io import BytesIO
+from typing import BinaryIO, Dict, Optional, Tuple, Union
+from PIL import Image, ImageChops, ImageOps, UnidentifiedImageError
 from config import settings
+from services.cache import create_cache
+from services.ocr import create_recognizers
+from services.qwen import post_chat_completion
+from services.taxonomy import normalize_exercise_type
 
 
 # Vision 模型提示词
@@ -79,13 +87,154 @@ VISION_PROMPT = """你是一个专业的运动数据识别助手。请仔细观
   "source_device": "huawei/apple/unknown"
 }"""
 
+# 提示词版本,提示词或模型变化后旧缓存自动失效
+VISION_PROMPT_VERSION = hashlib.sha256(
+    f"{settings.VISION_MODEL}\n{VISION_PROMPT}".encode()
+).hexdigest()[:16]
 
-async def parse_exercise_screenshot(image_bytes: bytes) -> Dict:
+# 截图识别结果缓存(按图片内容哈希)
+recognition_cache = create_cache(
+    "vision",
+    ttl=settings.VISION_CACHE_TTL,
+    max_entries=settings.VISION_CACHE_MAX_ENTRIES
+)
+
+
+# 图片预处理线程池(解码/缩放是 CPU 密集操作,不能阻塞事件循环)
+_image_executor = ThreadPoolExecutor(
+    max_workers=settings.VISION_IMAGE_WORKERS,
+    thread_name_prefix="vision-image"
+)
+
+# 预处理统计
+image_stats = {
+    "images": 0,
+    "bytes_in": 0,
+    "bytes_out": 0
+}
+
+# 本地识别器(按配置顺序尝试)
+local_recognizers = create_recognizers()
+
+# 本地识别统计
+ocr_stats = {
+    "attempts": 0,
+    "hits": 0,
+    "low_confidence": 0,
+    "invalid": 0,
+    "errors": 0
+}
+
+IMAGE_MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp"
+}
+
+
+def _crop_to_content(image: Image.Image, padding: int = 16) -> Image.Image:
+    """裁掉与左上角颜色相同的纯色边框,只保留数据区域"""
+    background = Image.new(image.mode, image.size, image.getpixel((0, 0)))
+    diff = ImageChops.difference(image, background).convert("L")
+    # 忽略压缩噪点
+    bbox = diff.point(lambda value: 255 if value > 24 else 0).getbbox()
+    if not bbox:
+        return image
+    
+    left, top, right, bottom = bbox
+    return image.crop((
+        max(left - padding, 0),
+        max(top - padding, 0),
+        min(right + padding, image.width),
+        min(bottom + padding, image.height)
+    ))
+
+
+def preprocess_image(image: Union[bytes, BinaryIO]) -> Tuple[bytes, str]:
+    """
+    缩放并重新编码截图,减少上传体积和视觉 token
+    
+    Args:
+        image: 原始图片字节流,或已上传的文件对象(直接从磁盘解码,不整体读入内存)
+    
+    Returns:
+        (处理后的图片字节流, MIME 类型)
+    
+    Raises:
+        ValueError: 图片无法解码或像素数过大
+    """
+    stream = BytesIO(image) if isinstance(image, bytes) else image
+    stream.seek(0, 2)
+    source_size = stream.tell()
+    stream.seek(0)
+    
+    try:
+        with Image.open(stream) as source:
+            source_format = source.format
+            image = ImageOps.exif_transpose(source)
+            
+            # 透明背景铺白,JPEG 不支持 alpha 通道
+            if image.mode in ("RGBA", "LA", "P"):
+                image = image.convert("RGBA")
+                canvas = Image.new("RGB", image.size, (255, 255, 255))
+                canvas.paste(image, mask=image.getchannel("A"))
+                image = canvas
+            elif image.mode != "RGB":
+                image = image.convert("RGB")
+            
+            if settings.VISION_IMAGE_CROP:
+                image = _crop_to_content(image)
+            
+            max_dim = settings.VISION_IMAGE_MAX_DIM
+            image.thumbnail((max_dim, max_dim), Image.LANCZOS)
+            
+            output_format = settings.VISION_IMAGE_FORMAT.upper()
+            buffer = BytesIO()
+            image.save(buffer, format=output_format, quality=settings.VISION_IMAGE_QUALITY, optimize=True)
+            processed = buffer.getvalue()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        # DecompressionBombError: 像素数超过 Image.MAX_IMAGE_PIXELS 的两倍
+        raise ValueError(f"图片无法解析: {str(e)}")
+    
+    # 重新编码反而更大时保留原图
+    if len(processed) >= source_size and source_format in IMAGE_MIME_TYPES:
+        stream.seek(0)
+        processed, output_format = stream.read(), source_format
+    
+    image_stats["images"] += 1
+    image_stats["bytes_in"] += source_size
+    image_stats["bytes_out"] += len(processed)
+    
+    return processed, IMAGE_MIME_TYPES[output_format]
+
+
+def preprocess_stats() -> Dict:
+    """预处理节省的字节数统计"""
+    return {
+        **image_stats,
+        "bytes_saved": image_stats["bytes_in"] - image_stats["bytes_out"]
+    }
+
+
+def local_recognition_stats() -> Dict:
+    """本地识别命中统计"""
+    return dict(ocr_stats)
+
+
+def image_cache_key(content_sha256: str) -> str:
+    """根据图片内容摘要和提示词版本生成缓存键"""
+    return hashlib.sha256(f"{VISION_PROMPT_VERSION}:{content_sha256}".encode()).hexdigest()
+
+
+async def parse_exercise_screenshot(image: Union[bytes, BinaryIO], content_sha256: Optional[str] = None,
+                                    user_id: Optional[int] = None) -> Dict:
     """
     解析运动截图,提取运动数据
     
     Args:
-        image_bytes: 图片字节流
+        image: 图片字节流,或已上传的文件对象
+        content_sha256: 图片内容的 SHA-256(上传时已边读边计算),为空时根据字节流计算
+        user_id: 上传用户ID(用于单用户并发限制)
     
     Returns:
         包含运动数据的字典
@@ -93,15 +242,90 @@ async def parse_exercise_screenshot(image_bytes: bytes) -> Dict:
     Raises:
         Exception: 识别失败时抛出异常
     """
+    if content_sha256 is None:
+        image = _read_image_bytes(image)
+        content_sha256 = hashlib.sha256(image).hexdigest()
+    
+    def compute():
+        # 创建共享任务之前读出字节: 相同截图的其他请求会等待这个任务,
+        # 而上传文件在发起请求结束(或被取消)时就会关闭
+        return _recognize_screenshot(_read_image_bytes(image), user_id)
+    
+    # 相同截图直接返回缓存结果,缓存的是模型原始输出,命中后重新校验
+    data = await recognition_cache.get_or_compute(image_cache_key(content_sha256), compute)
+    
+    return validate_and_fix_data(data)
+
+
+def _read_image_bytes(image: Union[bytes, BinaryIO]) -> bytes:
+    """文件对象读为字节(大小已受上传限制)"""
+    if isinstance(image, bytes):
+        return image
+    image.seek(0)
+    return image.read()
+
+
+async def _recognize_locally(image: bytes) -> Optional[Dict]:
+    """
+    用本地 OCR 识别常见版式的截图
+    
+    Args:
+        image: 图片字节流
+    
+    Returns:
+        通过校验的原始数据,置信度不足或识别失败时返回 None
+    """
+    loop = asyncio.get_running_loop()
+    for recognizer in local_recognizers:
+        if not recognizer.available():
+            continue
+        
+        ocr_stats["attempts"] += 1
+        try:
+            data, confidence = await loop.run_in_executor(_image_executor, recognizer.recognize, image)
+        except Exception as e:
+            print(f"本地识别失败({recognizer.name}): {str(e)}")
+            ocr_stats["errors"] += 1
+            continue
+        
+        if confidence < settings.VISION_OCR_MIN_CONFIDENCE:
+            ocr_stats["low_confidence"] += 1
+            continue
+        
+        try:
+            validate_and_fix_data(data)
+        except ValueError:
+            ocr_stats["invalid"] += 1
+            continue
+        
+        ocr_stats["hits"] += 1
+        return data
+    
+    return None
+
+
+async def _recognize_screenshot(image: bytes, user_id: Optional[int] = None) -> Dict:
+    """
+    识别截图,先尝试本地 OCR,不可靠时调用千问 VL 模型
+    
+    Args:
+        image: 图片字节流
+        user_id: 用户ID
+    
+    Returns:
+        原始识别数据(已通过校验)
+    """
+    data = await _recognize_locally(image)
+    if data is not None:
+        return data
+    
+    # 在线程池中缩放和重新编码
+    loop = asyncio.get_running_loop()
+    image_bytes, mime_type = await loop.run_in_executor(_image_executor, preprocess_image, image)
+    
     # 转换为 base64
     image_base64 = base64.b64encode(image_bytes).decode('utf-8')
     
-    # 构建 API 请求
-    headers = {
-        "Authorization": f"Bearer {settings.QWEN_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
     # 千问 VL 模型的消息格式
     payload = {
         "model": settings.VISION_MODEL,
@@ -110,7 +334,7 @@ async def parse_exercise_screenshot(image_bytes: bytes) -> Dict:
                 "role": "user",
                 "content": [
                     {"type": "text", "text": VISION_PROMPT},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"}}
+                    {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{image_base64}"}}
                 ]
             }
         ],
@@ -118,18 +342,13 @@ async def parse_exercise_screenshot(image_bytes: bytes) -> Dict:
         "max_tokens": settings.VISION_MAX_TOKENS
     }
     
-    # 调用千问 Vision API
-    async with httpx.AsyncClient(timeout=settings.API_TIMEOUT) as client:
-        response = await client.post(
-            f"{settings.QWEN_API_URL}/chat/completions",
-            headers=headers,
-            json=payload
-        )
-        
-        if response.status_code != 200:
-            raise Exception(f"API 调用失败: {response.status_code} - {response.text}")
-        
-        result = response.json()
+    # 调用千问 Vision API(共享连接池)
+    response = await post_chat_completion(payload, timeout=settings.VISION_TIMEOUT, user_id=user_id)
+    
+    if response.status_code != 200:
+        raise Exception(f"API 调用失败: {response.status_code} - {response.text}")
+    
+    result = response.json()
     
     # 解析返回的 JSON
     try:
@@ -151,10 +370,10 @@ async def parse_exercise_screenshot(image_bytes: bytes) -> Dict:
         print(f"完整响应: {result}")
         raise Exception(f"JSON 解析失败: {str(e)}")
     
-    # 数据验证和补充
-    validated_data = validate_and_fix_data(data)
+    # 校验失败的结果不写入缓存
+    validate_and_fix_data(data)
     
-    return validated_data
+    return data
 
 
 def validate_and_fix_data(data: Dict) -> Dict:
@@ -177,6 +396,9 @@ def validate_and_fix_data(data: Dict) -> Dict:
         print(f"完整数据: {data}")
         raise ValueError("运动类型缺失或格式错误")
     
+    if settings.EXERCISE_NORMALIZE_TYPES:
+        exercise_type = normalize_exercise_type(exercise_type)
+    
     # 判断是否为每日步数总结
     is_daily_steps = exercise_type == "每日步数"
     
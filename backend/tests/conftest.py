@@ -0,0 +1,90 @@
+"""测试公共夹具: 临时数据库 + 模拟千问 API"""
+import asyncio
+import io
+import json
+import os
+import sys
+import tempfile
+import httpx
+import pytest
+
+# 在导入应用之前配置环境(配置和限流器在导入时读取)
+WORK_DIR = tempfile.mkdtemp(prefix="familyfit-test-")
+os.makedirs(os.path.join(WORK_DIR, "data"), exist_ok=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORK_DIR, 'data', 'test.db')}"
+os.environ["QWEN_API_KEY"] = "test"
+# 按多 worker 部署分摊配额
+os.environ["WEB_CONCURRENCY"] = "4"
+os.chdir(WORK_DIR)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+import main  # noqa: E402
+from services import qwen  # noqa: E402
+
+VISION_CONTENT = json.dumps({
+    "exercise_type": "跑步", "duration_min": 30, "calories": 300, "steps": 5000,
+    "avg_heart_rate": 130, "max_heart_rate": 160, "date": None, "source_device": "huawei"
+}, ensure_ascii=False)
+DIET_CONTENT = json.dumps({
+    "health_score": 80, "total_calories": 500, "analysis": "搭配均衡",
+    "nutrition_balance": {"protein": "适中"}
+}, ensure_ascii=False)
+
+
+class MockModel:
+    """模拟千问接口: 记录请求、可设置延迟,统计同时进行的调用数"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = []
+        self.delay = 0.0
+        self.in_flight = 0
+        self.peak = 0
+        # 响应中的实际用量(限流器据此退回预估多扣的 TPM)
+        self.usage_tokens = 1500
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.calls.append(body)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+
+        content = VISION_CONTENT if body["model"].startswith("qwen-vl") else DIET_CONTENT
+        return httpx.Response(200, json={
+            "choices": [{"message": {"content": content}}],
+            "usage": {"total_tokens": self.usage_tokens}
+        })
+
+
+@pytest.fixture(scope="session")
+def model() -> MockModel:
+    return MockModel()
+
+
+@pytest.fixture(scope="session")
+def client(model: MockModel):
+    with TestClient(main.app) as test_client:
+        qwen._client = httpx.AsyncClient(base_url="https://qwen.test/v1", transport=httpx.MockTransport(model.handler))
+        yield test_client
+
+
+@pytest.fixture(autouse=True)
+def reset_model(model: MockModel):
+    model.reset()
+
+
+def png(color=(255, 255, 255), size=(200, 400)) -> bytes:
+    """生成一张纯色 PNG"""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "PNG")
+    return buffer.getvalue()
@@ -0,0 +1,37 @@
+"""流式饮食分析"""
+import asyncio
+from config import settings
+from services import diet
+
+
+def test_stream_stops_after_required_fields(monkeypatch):
+    chunks = [
+        '```json\n{\n  "health_score": 72,\n  "total_calories": 480,\n',
+        '  "analysis": "主食和蔬菜搭配合理",\n',
+        '  "nutrition_balance": {"protein": "充足", "carbs": "适中",',
+        ' "vegetables": "充足", "oil": "适中", "sugar": "较少"}\n}\n```',
+    ]
+    sent = []
+    closed = []
+
+    async def fake_stream(payload, timeout, user_id=None):
+        try:
+            for chunk in chunks:
+                sent.append(chunk)
+                yield chunk
+        finally:
+            closed.append(len(sent))
+
+    monkeypatch.setattr(settings, "DIET_STREAM", True)
+    monkeypatch.setattr(diet, "stream_chat_completion", fake_stream)
+
+    food_items = [{"name": "米饭", "amount": "1碗"}, {"name": "青菜", "amount": "200g"}]
+    result = asyncio.run(diet._request_meal_analysis(food_items))
+
+    # analysis 后的逗号到达即断开,营养平衡和对象结尾都没有读取
+    assert closed == [2]
+    assert result["health_score"] == 72
+    assert result["total_calories"] == 480
+    assert result["analysis"] == "主食和蔬菜搭配合理"
+    # 营养平衡由本地估算补齐
+    assert result["nutrition_balance"]["vegetables"] == "充足"
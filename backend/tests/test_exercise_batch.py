@@ -0,0 +1,21 @@
+"""批量截图识别"""
+import time
+from conftest import png
+from services.ratelimit import vision_limiter
+
+
+def test_batch_overlaps_model_calls_with_multiple_workers(client, model):
+    # WEB_CONCURRENCY=4 时每个 worker 仍保留单用户并发上限
+    assert vision_limiter.max_concurrency >= vision_limiter.per_user_concurrency > 1
+
+    model.delay = 0.3
+    files = [("files", (f"{i}.png", png((i, i, i)), "image/png")) for i in range(7)]
+
+    started = time.perf_counter()
+    response = client.post("/api/parse_report/batch", files=files, data={"user_id": "1"})
+    elapsed = time.perf_counter() - started
+
+    assert response.status_code == 200
+    assert response.json()["data"]["succeeded"] == 7
+    assert model.peak > 1
+    assert elapsed < 7 * model.delay
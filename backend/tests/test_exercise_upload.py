@@ -0,0 +1,15 @@
+"""单张截图上传"""
+from PIL import Image
+from conftest import png
+
+
+def test_decompression_bomb_is_rejected_as_bad_image(client, model, monkeypatch):
+    # 降低像素上限,用小图触发 DecompressionBombError
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+
+    files = {"file": ("bomb.png", png((12, 34, 56)), "image/png")}
+    response = client.post("/api/parse_report", files=files, data={"user_id": "1"})
+
+    assert response.status_code == 422
+    assert "图片无法解析" in response.json()["detail"]
+    assert model.calls == []
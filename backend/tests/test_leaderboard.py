@@ -0,0 +1,35 @@
+"""家庭与排行榜"""
+import uuid
+
+
+def register(client) -> dict:
+    """注册一个新用户,返回带 token 的请求头"""
+    username = f"user-{uuid.uuid4().hex[:8]}"
+    response = client.post("/api/auth/register", json={"username": username, "password": "secret-123", "name": username})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+def test_join_family_requires_login_and_invite_code(client):
+    owner, stranger = register(client), register(client)
+
+    response = client.post("/api/families", json={"name": "我们家"}, headers=owner)
+    assert response.status_code == 200
+    family = response.json()["data"]
+
+    # 未登录
+    response = client.post(f"/api/families/{family['id']}/members", json={"invite_code": family["invite_code"]})
+    assert response.status_code in (401, 403)
+
+    # 邀请码错误: 不能加入,也看不到家庭排行榜
+    response = client.post(f"/api/families/{family['id']}/members", json={"invite_code": "wrong"}, headers=stranger)
+    assert response.status_code == 403
+    response = client.get("/api/leaderboard", params={"family_id": family["id"]}, headers=stranger)
+    assert response.status_code == 403
+    assert client.get("/api/families", headers=stranger).json()["data"] == []
+
+    # 邀请码正确
+    response = client.post(f"/api/families/{family['id']}/members", json={"invite_code": family["invite_code"]}, headers=stranger)
+    assert response.status_code == 200
+    response = client.get("/api/leaderboard", params={"family_id": family["id"]}, headers=stranger)
+    assert response.status_code == 200
@@ -0,0 +1,41 @@
+"""每日任务"""
+from datetime import date, timedelta
+from sqlmodel import Session, select
+from database import engine
+from models import DailySummary, DailyTask, User
+
+
+def test_complete_task_without_daily_summary_returns_day_total(client):
+    # 没有任何运动/饮食记录的一天,还没有每日汇总
+    day = date.today() - timedelta(days=400)
+    with Session(engine) as session:
+        user = User(username=f"tasks-{day.isoformat()}", password_hash="x", name="任务测试", total_score=0)
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+        done = DailyTask(user_id=user.id, task_name="喝水", task_type="water", done=True, date=day, reward_points=10)
+        pending = DailyTask(user_id=user.id, task_name="拉伸", task_type="stretch", date=day, reward_points=20)
+        session.add_all([done, pending])
+        session.commit()
+        session.refresh(pending)
+        user_id, task_id = user.id, pending.id
+        assert session.get(DailySummary, (user_id, day)) is None
+
+    response = client.post("/api/tasks/done", json={"task_id": task_id, "user_id": user_id})
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["reward_points"] == 20
+    # 当日合计包含之前完成的任务,而不是只有本次奖励
+    assert data["total_points_today"] == 30
+
+    with Session(engine) as session:
+        summary = session.get(DailySummary, (user_id, day))
+        assert (summary.task_done, summary.task_points) == (2, 30)
+
+    # 重复提交不再计分
+    response = client.post("/api/tasks/done", json={"task_id": task_id, "user_id": user_id})
+    assert response.status_code == 200
+    with Session(engine) as session:
+        assert session.exec(
+            select(DailySummary.task_points).where(DailySummary.user_id == user_id, DailySummary.date == day)
+        ).one() == 30
@@ -0,0 +1,57 @@
+"""相同截图的识别去重"""
+import asyncio
+import hashlib
+import os
+import tempfile
+from services import vision
+
+
+def test_waiter_survives_cancelled_originator_closing_its_upload(client, monkeypatch):
+    image = os.urandom(1024)
+    sha256 = hashlib.sha256(image).hexdigest()
+    key = vision.image_cache_key(sha256)
+    gate = asyncio.Event()
+
+    async def fake_recognize(image, user_id=None):
+        await gate.wait()
+        # 与真实实现一样在共享任务里使用图片内容
+        content = image if isinstance(image, bytes) else image.read()
+        assert len(content) == 1024
+        return {"exercise_type": "跑步", "duration_min": 30, "calories": 300, "steps": None,
+                "avg_heart_rate": None, "max_heart_rate": None, "date": None, "source_device": "unknown"}
+
+    monkeypatch.setattr(vision, "_recognize_screenshot", fake_recognize)
+
+    def upload():
+        file = tempfile.SpooledTemporaryFile()
+        file.write(image)
+        file.seek(0)
+        return file
+
+    async def wait_until(condition):
+        for _ in range(1000):
+            if condition():
+                return
+            await asyncio.sleep(0.001)
+        raise AssertionError("等待超时")
+
+    async def scenario():
+        first_file, second_file = upload(), upload()
+
+        first = asyncio.create_task(vision.parse_exercise_screenshot(first_file, sha256, user_id=1))
+        await wait_until(lambda: key in vision.recognition_cache._inflight)
+
+        hits = vision.recognition_cache.hits
+        second = asyncio.create_task(vision.parse_exercise_screenshot(second_file, sha256, user_id=2))
+        await wait_until(lambda: vision.recognition_cache.hits > hits)
+
+        # 发起请求被取消,它的上传文件随之关闭
+        first.cancel()
+        first_file.close()
+        gate.set()
+
+        return await second
+
+    result = asyncio.run(scenario())
+    assert result["exercise_type"] == "跑步"
+    assert result["duration_min"] == 30